@@ -1,33 +1,82 @@
-from datetime import datetime, timedelta
+import heapq
+import sqlite3
+import sys
+from array import array
+from collections import namedtuple, OrderedDict
+from datetime import datetime, date
+from itertools import chain, groupby, repeat, takewhile
+from operator import itemgetter
 import db as database
 
-def get_period_type_for(db, name: str) -> database.UnitNames:
+# NumPy, see _numpy: importing it takes longer than the rest of the command line
+_NOT_IMPORTED = object()
+np = _NOT_IMPORTED
+
+# histories with at least this many periods are handled by NumPy when it is available
+NUMPY_THRESHOLD = 1024
+
+def _numpy():
+    """
+    NumPy, imported the first time a history is long enough to need it.
+    :return: the numpy module, None if it is not installed
+    """
+    global np
+    if np is _NOT_IMPORTED:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional, the pure-Python path gives the same results
+            numpy = None
+        np = numpy
+    return np
+
+# day ordinal of the first day of the tracker timestamps (epoch seconds)
+EPOCH_DAY = database.EPOCH.toordinal()
+
+def get_period_type_for(db, name: str, tenant: str = "") -> database.UnitNames:
     """
     Look up the period_type (1,2,3) for a given habit name.
     Raises ValueError if the habit doesn't exist.
 
     :return: UnitNames: the enum indicating the period granularity (daily, weekly, monthly)
     """
-    _id = database.find_counter_by_name(db, name)
-    row = database.get_period_type(db, _id)
-    if not row:
+    habit = database.find_habit(db, name, tenant)
+    if habit is None:
+        raise ValueError(f"No habit named '{name}'")
+    return habit.period_type
+
+def _lookup(db, name: str, tenant: str = "") -> tuple:
+    """
+    Resolves a habit name with one metadata cache lookup.
+    Raises ValueError if the habit doesn't exist.
+    :return: tuple: ID, period_type, period_count
+    """
+    habit = database.find_habit(db, name, tenant)
+    if habit is None:
         raise ValueError(f"No habit named '{name}'")
-    return database.UnitNames(row)
+    return habit.id, habit.period_type, habit.period_count
 
-def count_events(db, name: str):
+def count_events(db, name: str, since: datetime = None, until: datetime = None, tenant: str = ""):
     """
-    Counts the number of events for a given habit name
+    Counts the number of events for a given habit name,
+    optionally only inside the time range [since, until).
     :return: length: int: the number of events for a given habit name
     """
-    _id = database.find_counter_by_name(db, name)
-    data = database.get_counter_data(db, _id)
-    return len(data)
+    _id = database.find_counter_by_name(db, name, tenant)
+    return database.count_counter_events(db, _id, since, until)
 
-def group_by_period_type(db):
+def count_all_events(db, since: datetime = None, until: datetime = None, tenant: str = "") -> dict:
+    """
+    Counts the number of events of every habit of the tenant in a single query.
+    :return: dict: habit name to the number of its events (0 for habits without events)
+    """
+    counts = database.count_all_events(db, since, until)
+    return {name: counts.get(_id, 0) for name, _id in database.get_counter_ids(db, tenant).items()}
+
+def group_by_period_type(db, tenant: str = ""):
     """
     Group the data by period type.
     """
-    return database.group_by_period_type(db)
+    return database.group_by_period_type(db, tenant)
 
 def longest_streak(period_counts: dict, period_type: database.UnitNames, required: int) -> int:
     """
@@ -38,47 +87,610 @@ def longest_streak(period_counts: dict, period_type: database.UnitNames, require
     :param required: int: the number of times per period the habit is required
     :return: int: longest - the longest streak found in the history.
     """
-    # get all the period‐indices where we met the requirement
-    good_periods = sorted(idx for idx, cnt in period_counts.items() if cnt >= required)
+    # get all the period‐ordinals where we met the requirement
+    good_periods = sorted(index_to_ordinal(idx, period_type)
+                          for idx, cnt in period_counts.items() if cnt >= required)
+    return longest_run(good_periods)
+
+def longest_run(ordinals) -> int:
+    """
+    Length of the longest run of consecutive integers.
+    :param ordinals: sorted distinct period ordinals, a sequence or any iterable
+    :return: int: the longest run, 0 if there are none
+    """
+    if hasattr(ordinals, "__len__") and len(ordinals) >= NUMPY_THRESHOLD and _numpy() is not None:
+        arr = np.asarray(ordinals, dtype=np.int64)
+        # positions where a run ends, framed by the start and the end of the array
+        breaks = np.flatnonzero(np.diff(arr) != 1)
+        bounds = np.concatenate(([-1], breaks, [len(arr) - 1]))
+        return int(np.diff(bounds).max())
+    return run_stats(ordinals)[0]
+
+def run_stats(ordinals) -> tuple:
+    """
+    Runs of consecutive integers in one pass with constant memory.
+    :param ordinals: iterable of sorted distinct period ordinals, may be a generator
+    :return: tuple: (longest run, run ending at the last ordinal, last ordinal or None)
+    """
     longest = 0
     current = 0
-    prev_idx = None
-    for idx in good_periods:
-        # if this period is exactly the next after prev_idx, extend the run
-        if prev_idx is not None and prev_idx == previous_period(idx, period_type):  #
+    prev = None
+    for ordinal in ordinals:
+        # if this period directly follows prev, extend the run
+        if prev is not None and ordinal - prev == 1:
             current += 1
         else:
             # otherwise, start a new run here
             current = 1
         longest = max(longest, current)
-        prev_idx = idx
-    return longest
+        prev = ordinal
+    return longest, current, prev
 
-def streak_analyse(db, name: str):
+def ordinal_streak(ordinals, required: int) -> int:
+    """
+    Longest streak for a history given as period ordinals, one per event.
+    :param ordinals: sequence of period ordinals in any order
+    :param required: int: the number of times per period the habit is required
+    :return: int: the longest streak found in the history.
+    """
+    if len(ordinals) >= NUMPY_THRESHOLD and _numpy() is not None:
+        periods, counts = np.unique(np.asarray(ordinals, dtype=np.int64), return_counts=True)
+        return longest_run(periods[counts >= required])
+
+    counts = {}
+    for ordinal in ordinals:
+        counts[ordinal] = counts.get(ordinal, 0) + 1
+    return longest_run(sorted(o for o, cnt in counts.items() if cnt >= required))
+
+def streak_analyse(db, name: str, since: datetime = None, until: datetime = None, tenant: str = "",
+                   now: datetime = None):
     """
     Calculate the longest streak of meeting a counter’s periodic requirement.
 
     Fetches the period granularity and required count for the given habit,
-    then aggregates the counter’s timestamps into period-indexed counts. After that func
-    computes the longest consecutive sequence of periods during which the count
-    met or exceeded the required threshold.
+    then streams the periods that met or exceeded the required threshold from the
+    per-period rollup of the counter’s events in ascending order. After that func
+    computes the longest consecutive sequence of these periods, holding only
+    one batch of rows in memory regardless of the length of the history.
+
+    With `since`/`until` only the events inside [since, until) are taken into
+    account and only that slice is read. Bounds that fall inside a period
+    make it a partial period with just the events inside the range.
+
+    Like all_streaks and current_streak it ignores the periods after the
+    one of `now` (default: the current time): events recorded for the
+    future do not count yet.
 
     :return: tuple: length (number of consecutive periods), period_type (daily, weekly, monthly)
     """
-    period_type = get_period_type_for(db, name)
-    required = get_period_count_for(db, name)
+    _id, period_type, required = _lookup(db, name, tenant)
+    now_ordinal = period_ordinal(now or datetime.now(), period_type)
+    if since is None and until is None:
+        if streak_cache is not None:
+            longest = streak_cache.longest(db, _id, period_type, required, now_ordinal)
+            if longest is not None:
+                return longest, period_type
+        good_periods = (ordinal for ordinal, _ in database.iter_period_counts(
+            db, _id, required, until_ordinal=now_ordinal + 1))
+    elif is_period_start(since, period_type) and is_period_start(until, period_type):
+        # whole periods: the rollup rows of the range are enough
+        good_periods = (ordinal for ordinal, _ in database.iter_period_counts(
+            db, _id, required,
+            since_ordinal=period_ordinal(since, period_type) if since else None,
+            until_ordinal=period_ordinal(until, period_type) if until else None
+        ))
+    else:
+        events = (ts for _, ts in database.iter_counter_data(db, _id, since, until))
+        period_counts = event_period_counts(events, period_type)
+        compacted = database.iter_compacted_days(db, _id, since, until)
+        first = next(compacted, None)
+        if first is not None:
+            # add the days compaction.py rolled up, merged in period order
+            day_counts = ((_day_period_ordinal(day, period_type), count)
+                          for _, day, count in chain([first], compacted))
+            period_counts = ((ordinal, sum(count for _, count in group)) for ordinal, group in
+                             groupby(heapq.merge(period_counts, day_counts), key=itemgetter(0)))
+        good_periods = (ordinal for ordinal, count in period_counts if count >= required)
+
+    length = longest_run(takewhile(lambda ordinal: ordinal <= now_ordinal, good_periods))
+    return length, period_type
+
+def event_period_counts(timestamps, period_type: database.UnitNames):
+    """
+    Generator turning ascending epoch timestamps into (period_ordinal, count) pairs.
+    """
+    for ordinal, group in groupby(epoch_period_ordinal(ts, period_type) for ts in timestamps):
+        yield ordinal, sum(1 for _ in group)
+
+def _day_period_ordinal(day: int, period_type: database.UnitNames) -> int:
+    """
+    The period ordinal of the day with the given day ordinal.
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return day
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return (day - 1) // 7
+    return period_ordinal(date.fromordinal(day), period_type)
+
+def period_start(ordinal: int, period_type: database.UnitNames) -> datetime:
+    """
+    The first moment of the period with the given ordinal.
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return datetime.fromordinal(ordinal)
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return datetime.fromordinal(ordinal * 7 + 1)
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        return datetime(ordinal // 12, ordinal % 12 + 1, 1)
+    else:
+        raise ValueError("Unknown period type")
+
+def is_period_start(ts: datetime, period_type: database.UnitNames) -> bool:
+    """
+    Tells if the timestamp is the first moment of its period. None counts as an open bound.
+    """
+    return ts is None or period_start(period_ordinal(ts, period_type), period_type) == ts
+
+def last_periods(n: int, period_type: database.UnitNames, now: datetime = None) -> tuple:
+    """
+    The time range of the last `n` periods, the current one included.
+    :return: tuple: (since, until) for the range-bounded analyses
+    """
+    now_ordinal = period_ordinal(now or datetime.now(), period_type)
+    return period_start(now_ordinal - n + 1, period_type), period_start(now_ordinal + 1, period_type)
+
+def count_events_last(db, name: str, n: int, now: datetime = None, tenant: str = "") -> int:
+    """
+    Counts the events of the habit in its last `n` periods (e.g. the last 30 days of a daily habit).
+    """
+    since, until = last_periods(n, get_period_type_for(db, name, tenant), now)
+    return count_events(db, name, since, until, tenant)
+
+def streak_analyse_last(db, name: str, n: int, now: datetime = None, tenant: str = ""):
+    """
+    The longest streak of the habit within its last `n` periods.
+    :return: tuple: length, period_type like streak_analyse
+    """
+    since, until = last_periods(n, get_period_type_for(db, name, tenant), now)
+    return streak_analyse(db, name, since, until, tenant, now)
+
+class _StreakState:
+    """
+    Cached streak of one habit: the longest run, the run ending in the
+    newest good period, and the newest event that was taken into account.
+    """
+    __slots__ = ("last_event_id", "longest", "run", "last_good", "period_type", "required")
+
+    def __init__(self, last_event_id, longest, run, last_good, period_type, required):
+        self.last_event_id = last_event_id
+        self.longest = longest
+        self.run = run
+        self.last_good = last_good
+        self.period_type = period_type
+        self.required = required
+
+class StreakCache:
+    """
+    LRU cache of the longest streak per habit, optionally persisted in the
+    streak_cache table so it survives restarts.
+
+    The cache listens to the writes of the db module: a new event that only
+    adds to or extends the newest good period updates the cached streak in
+    place, anything else (older events, bulk inserts, deleted habits) drops
+    the entry so the next request recomputes it.
+    """
+
+    def __init__(self, maxsize: int = 256, persistent: bool = False):
+        """
+        :param maxsize: int: the number of habits kept in memory
+        :param persistent: bool: also store the results in the streak_cache table
+            (through writable connections without an open transaction)
+        """
+        self.maxsize = maxsize
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (database key, habit ID) -> _StreakState
+
+    def longest(self, db, counter_id: int, period_type: database.UnitNames, required: int,
+                now_ordinal: int = None) -> int:
+        """
+        The longest streak of the habit with the given ID, from the cache if possible.
+        The cached streak covers the whole history: with `now_ordinal` it is only
+        returned if no good period lies after it, otherwise the result is None.
+        """
+        key = (database.database_key(db), counter_id)
+        state = self._entries.get(key)
+        if self.persistent:
+            row = database.get_streak_cache(db, counter_id)
+            if row is None or state is not None and row[0] != state.last_event_id:
+                # the persisted row was dropped or replaced by another writer
+                state = None
+            if state is None and row is not None:
+                state = _StreakState(*row, period_type, required)
+
+        if state is None or state.period_type != period_type or state.required != required:
+            self.misses += 1
+            state = self._compute(db, counter_id, period_type, required)
+            self._save(db, counter_id, state)
+        else:
+            self.hits += 1
+
+        self._entries[key] = state
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if now_ordinal is not None and state.last_good is not None and state.last_good > now_ordinal:
+            return None
+        return state.longest
+
+    def invalidate(self, counter_id: int = None, db=None):
+        """
+        Drops the in-memory entry of one habit, or of all habits.
+        Without the connection the habit ID is dropped in every database.
+        """
+        if counter_id is None:
+            self._entries.clear()
+        elif db is not None:
+            self._entries.pop((database.database_key(db), counter_id), None)
+        else:
+            for key in [key for key in self._entries if key[1] == counter_id]:
+                del self._entries[key]
+
+    def on_event(self, db, counter_id: int, event_id, event_time: datetime):
+        """
+        Listener for db.add_event_listener, keeps the entry of the habit in sync.
+        """
+        state = self._entries.get((database.database_key(db), counter_id))
+        if state is None:
+            return
+        if event_id is None or event_time is None or (
+                state.last_event_id is not None and event_id <= state.last_event_id):
+            self.invalidate(counter_id, db)
+            return
+
+        ordinal = period_ordinal(event_time, state.period_type)
+        count = database.get_period_count_at(db, counter_id, ordinal)
+        if state.last_good is not None and ordinal <= state.last_good:
+            if ordinal < state.last_good and count == state.required:
+                # an older period became good, it may join two runs
+                self.invalidate(counter_id, db)
+                return
+        elif count == state.required:
+            # the period just met the requirement
+            if state.last_good is not None and ordinal - state.last_good == 1:
+                state.run += 1
+            else:
+                state.run = 1
+            state.longest = max(state.longest, state.run)
+            state.last_good = ordinal
+        state.last_event_id = event_id
+        self._save(db, counter_id, state)
+
+    @staticmethod
+    def _compute(db, counter_id, period_type, required) -> _StreakState:
+        good_periods = (ordinal for ordinal, _ in database.iter_period_counts(db, counter_id, required))
+        longest, run, last_good = run_stats(good_periods)
+        return _StreakState(database.get_last_event_id(db, counter_id), longest, run, last_good,
+                            period_type, required)
+
+    def _save(self, db, counter_id, state):
+        # a read must not commit pending writes of the caller: with a transaction
+        # open the result is only kept in memory
+        if not self.persistent or db.in_transaction:
+            return
+        try:
+            database.save_streak_cache(db, counter_id, state.last_event_id,
+                                       state.longest, state.run, state.last_good)
+        except sqlite3.OperationalError:
+            # read-only or locked connection, e.g. the readers of ConnectionPool
+            db.rollback()
+
+# the process-wide cache used by streak_analyse, see enable_streak_cache
+streak_cache = None
+
+def enable_streak_cache(maxsize: int = 256, persistent: bool = False) -> StreakCache:
+    """
+    Turns on caching of streak_analyse results for the whole process.
+    :return: StreakCache: the new cache
+    """
+    global streak_cache
+    disable_streak_cache()
+    streak_cache = StreakCache(maxsize, persistent)
+    database.add_event_listener(streak_cache.on_event)
+    return streak_cache
+
+def disable_streak_cache():
+    """
+    Turns off caching of streak_analyse results.
+    """
+    global streak_cache
+    if streak_cache is not None:
+        database.remove_event_listener(streak_cache.on_event)
+    streak_cache = None
+
+def current_streak(db, name: str, now: datetime = None, tenant: str = ""):
+    """
+    Calculate the current streak of meeting a counter’s periodic requirement.
 
-    # build count-by-period for this habit
-    period_counts = {}
-    _id = database.find_counter_by_name(db, name)
-    for _, ts_str in database.get_counter_data(db, _id):
-        ts = datetime.fromisoformat(ts_str)
-        idx = period_index(ts, period_type)
-        period_counts[idx] = period_counts.get(idx, 0) + 1
+    Walks backwards from the period of `now` over the newest periods only and
+    stops at the first period that missed the requirement, so the cost depends
+    on the streak length, not on the length of the history. While the current
+    period is not fulfilled yet the streak may still end in the previous one.
 
-    length = longest_streak(period_counts, period_type, required)
+    :return: tuple: length (number of consecutive periods), period_type (daily, weekly, monthly)
+    """
+    _id, period_type, required = _lookup(db, name, tenant)
+    now_ordinal = period_ordinal(now or datetime.now(), period_type)
+
+    length = 0
+    expected = now_ordinal
+    for ordinal, count in database.iter_period_counts_desc(db, _id):
+        if ordinal > now_ordinal:
+            # events recorded for the future do not count yet
+            continue
+        met = count >= required
+        if ordinal != expected and length == 0 and expected == now_ordinal:
+            # the current period has no events yet, the streak may end in the previous one
+            expected = now_ordinal - 1
+        elif not met and length == 0 and expected == now_ordinal:
+            # the current period is still open, try to start from the previous one
+            continue
+        if ordinal != expected or not met:
+            break
+        length += 1
+        expected -= 1
     return length, period_type
 
+# one entry of the all_streaks ranking
+HabitStreak = namedtuple("HabitStreak", ["name", "longest", "current", "period_type"])
+
+def sorted_streaks(period_counts, required: int, now_ordinal: int) -> tuple:
+    """
+    Longest and current streak in one pass over a habit's history.
+    The current streak is the run that ends in the current period or,
+    while the current period is still open, in the one before it.
+    Events after the current period are ignored.
+    :param period_counts: iterable of (period_ordinal, count) pairs in ascending order
+    :param required: int: the number of times per period the habit is required
+    :param now_ordinal: int: the period ordinal of "now"
+    :return: tuple: (longest, current)
+    """
+    longest = 0
+    run = 0
+    last_good = None
+    for ordinal, count in period_counts:
+        if ordinal > now_ordinal:
+            # events recorded for the future do not count yet
+            break
+        if count < required:
+            continue
+        run = run + 1 if last_good is not None and ordinal - last_good == 1 else 1
+        longest = max(longest, run)
+        last_good = ordinal
+
+    current = run if last_good is not None and now_ordinal - last_good in (0, 1) else 0
+    return longest, current
+
+def all_streaks(db, now: datetime = None, tenant: str = "") -> list:
+    """
+    Longest and current streak of every habit of the tenant, computed from one
+    ordered query over counter and the per-period rollup in a single streaming pass.
+    :return: list: HabitStreak entries ranked by longest, then current streak
+    """
+    result = streaks_from_rows(database.iter_all_period_counts(db, tenant=tenant), now or datetime.now())
+    return rank_streaks(result)
+
+def streaks_from_rows(rows, now: datetime) -> list:
+    """
+    Longest and current streaks from the rows of db.iter_all_period_counts.
+    :return: list: HabitStreak entries in the order of the rows
+    """
+    result = []
+    for (_, name, period_type, required), habit_rows in groupby(rows, key=lambda row: row[:4]):
+        period_type = database.UnitNames(period_type)
+        period_counts = (row[4:] for row in habit_rows if row[4] is not None)
+        longest, current = sorted_streaks(period_counts, required, period_ordinal(now, period_type))
+        result.append(HabitStreak(name, longest, current, period_type))
+    return result
+
+def rank_streaks(streaks: list) -> list:
+    """
+    Sorts HabitStreak entries in place by longest, then current streak, best first.
+    """
+    streaks.sort(key=lambda streak: (streak.longest, streak.current), reverse=True)
+    return streaks
+
+def period_ordinal(ts: datetime, period_type: database.UnitNames) -> int:
+    """
+    Maps a timestamp to an integer period number, so that consecutive
+    periods differ by exactly one:
+    - daily → proleptic Gregorian day number (date.toordinal)
+    - weekly → number of the ISO week (weeks start on Monday, as 0001-01-01 does)
+    - monthly → year * 12 + month - 1
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return ts.toordinal()
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return (ts.toordinal() - 1) // 7
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        return ts.year * 12 + ts.month - 1
+    else:
+        raise ValueError("Unknown period type")
+
+def epoch_period_ordinal(seconds: int, period_type: database.UnitNames) -> int:
+    """
+    period_ordinal for a tracker timestamp in epoch seconds, without building a datetime
+    for daily and weekly habits.
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return seconds // 86400 + EPOCH_DAY
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return (seconds // 86400 + EPOCH_DAY - 1) // 7
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        return period_ordinal(database.from_epoch(seconds), period_type)
+    else:
+        raise ValueError("Unknown period type")
+
+class PeriodCalendar:
+    """
+    Precomputed lookup tables between period ordinals (see period_ordinal) and
+    the period index tuples of period_index for the years [first_year, last_year].
+
+    The tables are compact arrays: year, month and day of every day, ISO year
+    and week number of every week (kept as ready-made index tuples, so a lookup
+    allocates nothing), and the first ordinal of every month and ISO year for the
+    way back. Ordinals and indices outside the range give None, the
+    callers then compute the conversion with the datetime functions.
+    """
+    __slots__ = ("first_year", "last_year", "_first_day", "_first_week",
+                 "_day_year", "_day_month", "_day_day", "_month_start",
+                 "_weeks", "_year_week")
+
+    def __init__(self, first_year: int = 1970, last_year: int = 2100):
+        if not 1 < first_year <= last_year < 9999:
+            raise ValueError(f"Invalid calendar range {first_year}..{last_year}")
+        self.first_year = first_year
+        self.last_year = last_year
+
+        # day ordinal of the 1st of every month, plus the end of the range
+        self._month_start = array("l", (
+            date(year, month, 1).toordinal()
+            for year in range(first_year, last_year + 1) for month in range(1, 13)
+        ))
+        self._month_start.append(date(last_year + 1, 1, 1).toordinal())
+        self._first_day = self._month_start[0]
+        self._day_year = array("H")
+        self._day_month = array("B")
+        self._day_day = array("B")
+        for i in range(len(self._month_start) - 1):
+            days = self._month_start[i + 1] - self._month_start[i]
+            self._day_year.extend(repeat(first_year + i // 12, days))
+            self._day_month.extend(repeat(i % 12 + 1, days))
+            self._day_day.extend(range(1, days + 1))
+
+        # week ordinal of week 1 of every ISO year, plus the end of the range
+        self._year_week = array("l", (
+            (date.fromisocalendar(year, 1, 1).toordinal() - 1) // 7
+            for year in range(first_year, last_year + 2)
+        ))
+        self._first_week = self._year_week[0]
+        self._weeks = tuple(
+            (first_year + i, week)
+            for i in range(len(self._year_week) - 1)
+            for week in range(1, self._year_week[i + 1] - self._year_week[i] + 1)
+        )
+
+    def day_index(self, ordinal: int):
+        """
+        :return: tuple: (YYYY, MM, DD) of the day ordinal, or None outside the range
+        """
+        i = ordinal - self._first_day
+        if 0 <= i < len(self._day_year):
+            return self._day_year[i], self._day_month[i], self._day_day[i]
+        return None
+
+    def day_ordinal(self, year: int, month: int, day: int):
+        """
+        :return: int: the day ordinal of the date, or None outside the range
+        """
+        if not self.first_year <= year <= self.last_year:
+            return None
+        if not 1 <= month <= 12:
+            raise ValueError(f"month must be in 1..12, not {month}")
+        m = (year - self.first_year) * 12 + month - 1
+        start = self._month_start[m]
+        if not 1 <= day <= self._month_start[m + 1] - start:
+            raise ValueError(f"day is out of range for month: {year}-{month}-{day}")
+        return start + day - 1
+
+    def week_index(self, ordinal: int):
+        """
+        :return: tuple: (ISO year, ISO week) of the week ordinal, or None outside the range
+        """
+        i = ordinal - self._first_week
+        if 0 <= i < len(self._weeks):
+            return self._weeks[i]
+        return None
+
+    def week_ordinal(self, year: int, week: int):
+        """
+        :return: int: the week ordinal of the ISO week, or None outside the range
+        """
+        if not self.first_year <= year <= self.last_year:
+            return None
+        y = year - self.first_year
+        start = self._year_week[y]
+        if not 1 <= week <= self._year_week[y + 1] - start:
+            raise ValueError(f"Invalid week: {week}")
+        return start + week - 1
+
+    def nbytes(self) -> int:
+        """
+        Memory used by the tables.
+        """
+        return sum(a.itemsize * len(a) for a in (
+            self._day_year, self._day_month, self._day_day, self._month_start, self._year_week
+        )) + sys.getsizeof(self._weeks) + sum(sys.getsizeof(idx) for idx in self._weeks)
+
+# The calendar used by period_index & co., built on first use
+_calendar = None
+
+def get_calendar() -> PeriodCalendar:
+    """
+    The calendar tables of the period conversions, built with the default range if needed.
+    """
+    global _calendar
+    if _calendar is None:
+        _calendar = PeriodCalendar()
+    return _calendar
+
+def set_calendar_range(first_year: int, last_year: int) -> PeriodCalendar:
+    """
+    Rebuilds the calendar tables of the period conversions for the given years.
+    """
+    global _calendar
+    _calendar = PeriodCalendar(first_year, last_year)
+    return _calendar
+
+def index_to_ordinal(idx: tuple, period_type: database.UnitNames) -> int:
+    """
+    Converts a period index from period_index into its period ordinal.
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        ordinal = (_calendar or get_calendar()).day_ordinal(*idx)
+        return ordinal if ordinal is not None else date(*idx).toordinal()
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        ordinal = (_calendar or get_calendar()).week_ordinal(*idx)
+        if ordinal is not None:
+            return ordinal
+        return (date.fromisocalendar(idx[0], idx[1], 1).toordinal() - 1) // 7
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        return idx[0] * 12 + idx[1] - 1
+    else:
+        raise ValueError("Unknown period type")
+
+def ordinal_to_index(ordinal: int, period_type: database.UnitNames) -> tuple:
+    """
+    Converts a period ordinal back into the period index tuple of period_index.
+    """
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        idx = (_calendar or get_calendar()).day_index(ordinal)
+        if idx is not None:
+            return idx
+        day = date.fromordinal(ordinal)
+        return day.year, day.month, day.day
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        idx = (_calendar or get_calendar()).week_index(ordinal)
+        if idx is not None:
+            return idx
+        year, week, _ = date.fromordinal(ordinal * 7 + 1).isocalendar()
+        return year, week
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        return ordinal // 12, ordinal % 12 + 1
+    else:
+        raise ValueError("Unknown period type")
+
 def period_index(ts: datetime, period_type: database.UnitNames) -> tuple:
     """
     Maps a timestamp to a (year, period) tuple:
@@ -89,8 +701,12 @@ def period_index(ts: datetime, period_type: database.UnitNames) -> tuple:
     if period_type is database.UnitNames.PERIOD_DAILY:
         return ts.year, ts.month, ts.day
     elif period_type is database.UnitNames.PERIOD_WEEKLY:
-        # iso calendar()[1] gives ISO week number
-        return ts.isocalendar()[0], ts.isocalendar()[1]
+        # the ISO week is looked up by the week ordinal instead of calling isocalendar()
+        idx = (_calendar or get_calendar()).week_index((ts.toordinal() - 1) // 7)
+        if idx is not None:
+            return idx
+        year, week, _ = ts.isocalendar()
+        return year, week
     elif period_type is database.UnitNames.PERIOD_MONTHLY:
         return ts.year, ts.month
     else:
@@ -103,29 +719,7 @@ def previous_period(idx: tuple, period_type: database.UnitNames) -> tuple:
     :param period_type: UnitNames: the enum indicating the period granularity (daily, weekly, monthly)
     ":return: tuple: the prior period index (year, period unit)
     """
-    if period_type is database.UnitNames.PERIOD_DAILY:
-        dt = datetime(idx[0], idx[1], idx[2]) - timedelta(days=1)
-        return dt.year, dt.month, dt.day
-    elif period_type is database.UnitNames.PERIOD_WEEKLY:
-        # Convert back to a date, subtract 1 week
-        # Use Monday of that ISO week:
-        year, week = idx
-        if week == 1:
-            # go to the last week of the previous year
-            year -= 1
-            week = datetime(year, 12, 28).isocalendar()[1]
-        else:
-            week -= 1
-        dt = datetime.strptime(f'{year}-W{week}-1', "%G-W%V-%u")
-        return dt.isocalendar()[0], dt.isocalendar()[1]
-    elif period_type is database.UnitNames.PERIOD_MONTHLY:
-        year, month = idx
-        if month == 1:
-            return year - 1, 12
-        else:
-            return year, month - 1
-    else:
-        raise ValueError("Unknown period type")
+    return ordinal_to_index(index_to_ordinal(idx, period_type) - 1, period_type)
 
 def next_period(idx: tuple, period_type: database.UnitNames) -> tuple:
     """
@@ -134,36 +728,15 @@ def next_period(idx: tuple, period_type: database.UnitNames) -> tuple:
     :param period_type: UnitNames: the enum indicating the period granularity (daily, weekly, monthly)
     :return: tuple: the next period index (year, period unit)
     """
-    if period_type is database.UnitNames.PERIOD_DAILY:
-        year, month, day = idx
-        dt = datetime(year, month, day) + timedelta(days=1)
-        return dt.year, dt.month, dt.day
-
-    elif period_type is database.UnitNames.PERIOD_WEEKLY:
-        year, week = idx
-        # find the Monday of this ISO week
-        dt = datetime.strptime(f'{year}-W{week}-1', "%G-W%V-%u")
-        dt_next = dt + timedelta(weeks=1)
-        return dt_next.isocalendar()[0], dt_next.isocalendar()[1]
-
-    elif period_type is database.UnitNames.PERIOD_MONTHLY:
-        year, month = idx
-        if month == 12:
-            return year + 1, 1
-        else:
-            return year, month + 1
-
-    else:
-        raise ValueError("Unknown period type")
+    return ordinal_to_index(index_to_ordinal(idx, period_type) + 1, period_type)
 
-def get_period_count_for(db, name: str) -> int:
+def get_period_count_for(db, name: str, tenant: str = "") -> int:
     """
     Fetches from the DB how many times per period the habit with a given name is required.
     Raises ValueError if the habit isn't found.
     :return: int: the number of times per period the habit is required.
     """
-    _id = database.find_counter_by_name(db, name)
-    row = database.get_period_count(db, _id)
-    if row is None:
+    habit = database.find_habit(db, name, tenant)
+    if habit is None:
         raise ValueError(f"Habit '{name}' not found in your database.")
-    return row
+    return habit.period_count
@@ -0,0 +1,217 @@
+import asyncio
+import queue
+import threading
+from datetime import datetime
+
+import analyse
+import db as database
+
+class AsyncHabits:
+    """
+    Non-blocking facade over the db, counter and analyse functions for asyncio code.
+
+    All writes go through one dedicated writer thread. Check-ins that arrive
+    while it is busy are queued and written together in one transaction, so
+    many concurrent add_event calls cost one commit. Reads run in the default
+    executor on the read connections of a db.ConnectionPool.
+
+        async with AsyncHabits("main.db") as habits:
+            await asyncio.gather(*(habits.add_event("Water") for _ in range(4)))
+            length, period_type = await habits.streak_analyse("Water")
+    """
+
+    def __init__(self, path: str = "main.db", readers: int = 4, max_batch: int = 1000):
+        """
+        :param path: path of the database file
+        :param readers: int: the number of read connections
+        :param max_batch: int: the most check-ins written in one transaction
+        """
+        self.max_batch = max_batch
+        self.batches = 0
+        self._pool = database.ConnectionPool(path, readers)
+        self._queue = queue.Queue()
+        # guards _closed against the writer draining the queue when it stops
+        self._lock = threading.Lock()
+        self._closed = False
+        self._batch = []
+        self._writer = threading.Thread(target=self._write_loop, name="habits-writer", daemon=True)
+        self._writer.start()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """
+        Writes what is still queued, stops the writer thread and closes the connections.
+        Writes submitted afterwards raise RuntimeError.
+        """
+        with self._lock:
+            self._closed = True
+        self._queue.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        self._pool.close()
+
+    # ——— writes ———
+
+    async def add_event(self, name: str, date: datetime = None):
+        """
+        Checks off the habit, see counter.add_event. Raises ValueError for unknown habits.
+        """
+        return await self._submit(("event", name, date or datetime.now()))
+
+    async def add_counter(self, name: str, description: str, period_type: database.UnitNames, period_count: int):
+        """
+        See db.add_counter.
+        :return: ID of the new habit
+        """
+        return await self._submit(("call", database.add_counter, (name, description, period_type, period_count)))
+
+    async def delete_habit(self, name: str):
+        """
+        Deletes the habit and its events, see counter.delete_event.
+        """
+        def delete(db, habit_name):
+            _id = database.find_counter_by_name(db, habit_name)
+            if _id is None:
+                raise ValueError(f"No such habit: {habit_name!r}")
+            database.delete_counter(db, _id)
+        return await self._submit(("call", delete, (name,)))
+
+    async def _submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("AsyncHabits is closed")
+            self._queue.put((*item, loop, future))
+        return await future
+
+    def _write_loop(self):
+        error = None
+        try:
+            self._write_batches()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # nothing is written any more: fail what is in flight or still queued
+            with self._lock:
+                self._closed = True
+                pending = self._batch
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        pending.append(item)
+            for item in pending:
+                stopped = RuntimeError("the writer thread of AsyncHabits has stopped")
+                stopped.__cause__ = error
+                _resolve(*item[-2:], error=stopped)
+
+    def _write_batches(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._batch = batch
+            with self._pool.writer() as db:
+                events = []
+                for item in batch:
+                    if item[0] == "event":
+                        events.append(item)
+                        continue
+                    # keep the order: queued check-ins are written before the call
+                    self._write_events(db, events)
+                    events = []
+                    _, fn, args, loop, future = item
+                    try:
+                        _resolve(loop, future, fn(db, *args))
+                    except Exception as e:
+                        _resolve(loop, future, error=e)
+                self._write_events(db, events)
+            self._batch = []
+            if stop:
+                return
+
+    def _write_events(self, db, events):
+        if not events:
+            return
+        ids = database.get_counter_ids(db)
+        rows = []
+        accepted = []
+        for _, name, date, loop, future in events:
+            if name not in ids:
+                _resolve(loop, future, error=ValueError(f"No such habit: {name!r}"))
+                continue
+            rows.append((ids[name], date))
+            accepted.append((loop, future))
+        try:
+            with database.transaction(db):
+                database.increment_counter_many(db, rows)
+        except Exception as e:
+            for loop, future in accepted:
+                _resolve(loop, future, error=e)
+            return
+        self.batches += 1
+        for loop, future in accepted:
+            _resolve(loop, future, None)
+
+    # ——— reads ———
+
+    async def run(self, fn, *args):
+        """
+        Runs fn(db, *args) on a read connection without blocking the event loop.
+        """
+        def read():
+            with self._pool.reader() as db:
+                return fn(db, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    async def count_events(self, name: str, since: datetime = None, until: datetime = None):
+        return await self.run(analyse.count_events, name, since, until)
+
+    async def streak_analyse(self, name: str, since: datetime = None, until: datetime = None):
+        return await self.run(analyse.streak_analyse, name, since, until)
+
+    async def current_streak(self, name: str, now: datetime = None):
+        return await self.run(analyse.current_streak, name, now)
+
+    async def all_streaks(self, now: datetime = None):
+        return await self.run(analyse.all_streaks, now)
+
+    async def get_habit_names(self):
+        return await self.run(database.get_habit_names)
+
+def _resolve(loop, future, result=None, error=None):
+    """
+    Completes an asyncio future from the writer thread, unless it is done already.
+    """
+    def complete():
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    try:
+        loop.call_soon_threadsafe(complete)
+    except RuntimeError:
+        # the event loop is closed, nobody waits for the result
+        pass
@@ -0,0 +1,45 @@
+"""
+Check-ins through counter.add_event, one commit per event, against
+counter.add_events, which writes the whole batch in one transaction.
+
+Run from the project folder:
+    python benchmarks/bench_add_events.py [--events 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db as database
+from counter import add_event, add_events
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    start = datetime(2025, 1, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database.get_db(os.path.join(tmp, "bench.db"))
+        database.add_counter(db, "single", "", database.UnitNames.PERIOD_DAILY, 1)
+        database.add_counter(db, "bulk", "", database.UnitNames.PERIOD_DAILY, 1)
+
+        started = time.perf_counter()
+        for i in range(args.events):
+            add_event("single", db, start + timedelta(hours=i))
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        add_events(db, (("bulk", start + timedelta(hours=i)) for i in range(args.events)))
+        bulk = time.perf_counter() - started
+        db.close()
+
+    print(f"{'add_event':>12} {args.events / single:10.0f} events/s")
+    print(f"{'add_events':>12} {args.events / bulk:10.0f} events/s  ({single / bulk:.1f}x)")
+
+if __name__ == "__main__":
+    main()
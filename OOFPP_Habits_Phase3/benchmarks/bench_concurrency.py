@@ -0,0 +1,76 @@
+"""
+Concurrent reads and writes through db.ConnectionPool: one writer thread
+recording check-ins while reader threads run the analyses, in WAL mode
+and, for comparison, in the rollback journal mode SQLite uses by default.
+
+Run from the project folder:
+    python benchmarks/bench_concurrency.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db as database
+
+HABITS = 20
+
+def run(journal_mode, readers, seconds):
+    """
+    :return: tuple: (writes per second, reads per second)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = database.ConnectionPool(os.path.join(tmp, "bench.db"), readers=readers,
+                                       journal_mode=journal_mode, busy_timeout=5000)
+        with pool.writer() as db:
+            for i in range(HABITS):
+                database.add_counter(db, f"habit-{i}", "benchmark", database.PERIOD_DAILY, 1)
+
+        stop = threading.Event()
+        writes = [0]
+        reads = [0] * readers
+
+        def write():
+            start = datetime(2020, 1, 1)
+            while not stop.is_set():
+                with pool.writer() as db:
+                    database.increment_counter(db, writes[0] % HABITS + 1, start + timedelta(hours=writes[0]))
+                writes[0] += 1
+
+        def read(slot):
+            while not stop.is_set():
+                with pool.reader() as db:
+                    database.count_counter_events(db, reads[slot] % HABITS + 1)
+                    database.get_period_counts(db, reads[slot] % HABITS + 1)
+                reads[slot] += 1
+
+        threads = [threading.Thread(target=write)]
+        threads += [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        pool.close()
+    return writes[0] / seconds, sum(reads) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'journal':>8} {'readers':>8} {'writes/s':>10} {'reads/s':>10}")
+    for journal_mode in ("WAL", "DELETE"):
+        for readers in args.readers:
+            writes, reads = run(journal_mode, readers, args.seconds)
+            print(f"{journal_mode:>8} {readers:>8} {writes:>10.0f} {reads:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Scaling of parallel.parallel_all_streaks with the number of worker processes,
+against the sequential analyse.all_streaks.
+
+Run from the project folder:
+    python benchmarks/bench_parallel.py --habits 20000 --events 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyse
+import db as database
+from parallel import parallel_all_streaks
+
+def fill(db, habits, events):
+    """
+    Seeds `habits` habits of all period types with `events` check-ins each.
+    """
+    rnd = random.Random(habits)
+    with database.transaction(db):
+        for i in range(habits):
+            database.add_counter(db, f"habit-{i}", "benchmark", database.UnitNames(i % 3 + 1), rnd.randint(1, 3))
+    start = datetime(2020, 1, 1)
+    database.increment_counter_many(db, (
+        (counter_id, start + timedelta(hours=rnd.randint(0, 5 * 365 * 24)))
+        for counter_id in range(1, habits + 1) for _ in range(events)
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="*")
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = database.get_db(path)
+        fill(db, args.habits, args.events)
+        now = datetime(2025, 1, 1)
+
+        start = time.perf_counter()
+        expected = analyse.all_streaks(db, now)
+        sequential = time.perf_counter() - start
+        db.close()
+        print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+        print(f"{'seq':>8} {sequential:>8.2f} {1:>8.2f}")
+
+        for n in workers:
+            start = time.perf_counter()
+            result = parallel_all_streaks(path, workers=n, now=now)
+            elapsed = time.perf_counter() - start
+            assert result == expected
+            print(f"{n:>8} {elapsed:>8.2f} {sequential / elapsed:>8.2f}")
+
+if __name__ == "__main__":
+    main()
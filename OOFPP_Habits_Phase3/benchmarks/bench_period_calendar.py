@@ -0,0 +1,103 @@
+"""
+Period index conversions with the precomputed calendar tables vs. the former
+isocalendar()/strptime implementation.
+
+Converts `count` timestamps (spread over 1990-2040) with period_index and
+steps every weekly and daily index back and forth with previous_period and
+next_period.
+
+Run from the project folder:
+    python benchmarks/bench_period_calendar.py [count]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyse
+import db as database
+
+CHUNK = 100_000
+
+def legacy_period_index(ts, period_type):
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return ts.year, ts.month, ts.day
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return ts.isocalendar()[0], ts.isocalendar()[1]
+    return ts.year, ts.month
+
+def legacy_previous_period(idx, period_type):
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        dt = datetime(idx[0], idx[1], idx[2]) - timedelta(days=1)
+        return dt.year, dt.month, dt.day
+    year, week = idx
+    if week == 1:
+        year -= 1
+        week = datetime(year, 12, 28).isocalendar()[1]
+    else:
+        week -= 1
+    dt = datetime.strptime(f'{year}-W{week}-1', "%G-W%V-%u")
+    return dt.isocalendar()[0], dt.isocalendar()[1]
+
+def legacy_next_period(idx, period_type):
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        dt = datetime(*idx) + timedelta(days=1)
+        return dt.year, dt.month, dt.day
+    dt = datetime.strptime(f'{idx[0]}-W{idx[1]}-1', "%G-W%V-%u") + timedelta(weeks=1)
+    return dt.isocalendar()[0], dt.isocalendar()[1]
+
+IMPLEMENTATIONS = {
+    "legacy": (legacy_period_index, legacy_previous_period, legacy_next_period),
+    "calendar": (analyse.period_index, analyse.previous_period, analyse.next_period),
+}
+
+def run(count, timestamps, period_type, period_index, previous_period, next_period):
+    """
+    :return: tuple: seconds of period_index and of previous_period + next_period over `count` timestamps
+    """
+    convert = navigate = 0.0
+    done = 0
+    while done < count:
+        chunk = timestamps[:count - done]
+        start = time.perf_counter()
+        indices = [period_index(ts, period_type) for ts in chunk]
+        convert += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for idx in indices:
+            previous_period(idx, period_type)
+            next_period(idx, period_type)
+        navigate += time.perf_counter() - start
+        done += len(chunk)
+    return convert, navigate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("count", nargs="?", type=int, default=10_000_000)
+    parser.add_argument("--navigation", type=int, default=1_000_000,
+                        help="timestamps stepped with previous/next_period (the legacy version is slow)")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    start = datetime(1990, 1, 1)
+    timestamps = [start + timedelta(seconds=rnd.randint(0, 50 * 365 * 86400)) for _ in range(CHUNK)]
+
+    # build the tables up front, so they are not part of the timings
+    begin = time.perf_counter()
+    calendar = analyse.get_calendar()
+    print(f"calendar {calendar.first_year}-{calendar.last_year}: {calendar.nbytes()} bytes, "
+          f"built in {(time.perf_counter() - begin) * 1000:.1f} ms")
+
+    print(f"{'period':>8} {'impl':>9} {'period_index s':>15} {'prev+next s':>12}")
+    for period_type in (database.UnitNames.PERIOD_WEEKLY, database.UnitNames.PERIOD_DAILY):
+        for name, functions in IMPLEMENTATIONS.items():
+            convert, _ = run(args.count, timestamps, period_type, functions[0], lambda *a: None, lambda *a: None)
+            _, navigate = run(args.navigation, timestamps, period_type, *functions)
+            print(f"{period_type.name[7:].lower():>8} {name:>9} {convert:>15.2f} {navigate:>12.2f}")
+
+if __name__ == "__main__":
+    main()
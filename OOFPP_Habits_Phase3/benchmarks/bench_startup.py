@@ -0,0 +1,51 @@
+"""
+Start-up time of the non-interactive command line (main.py list) and the
+import time of the modules it loads, compared with importing questionary,
+which only the interactive menu needs.
+
+Run from the project folder:
+    python benchmarks/bench_startup.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def timed(args, repeat):
+    """
+    :return: float: median wall time of the command in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=PROJECT, check=True, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        rows = [
+            ("python -c pass", [sys.executable, "-c", "pass"]),
+            ("import main", [sys.executable, "-c", "import main"]),
+            ("main.py list", [sys.executable, "main.py", "--db", path, "list"]),
+        ]
+        try:
+            import questionary  # noqa: F401
+            rows.append(("import questionary", [sys.executable, "-c", "import questionary"]))
+        except ImportError:
+            print("questionary is not installed, its import time is not measured")
+        for label, command in rows:
+            print(f"{label:>20} {timed(command, args.repeat):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark suite on a seeded synthetic database (see synthetic.py):
+- increment_counter: single check-ins per second, each with its own commit
+- increment_counter_many: bulk check-ins per second
+- count_events, streak_analyse, current_streak: mean latency per habit
+- CLI longest streaks: `main.py streak --all` in the same process
+
+The results are written as JSON, and compared with an earlier result file
+given by --compare; slowdowns beyond --threshold are reported as regressions
+and make the exit status 1.
+
+Run from the project folder:
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyse
+import db as database
+import main as cli
+import synthetic
+
+# whether a larger value of the metric is better
+HIGHER_IS_BETTER = {"per_second": True, "ms": False}
+
+def timed(fn, repeat: int) -> float:
+    """
+    :return: float: median wall time of fn() in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def per_habit(fn, specs, repeat: int) -> float:
+    """
+    :return: float: mean latency in milliseconds of fn(name) over the habits, median of `repeat` rounds
+    """
+    names = [name for name, _, _ in specs]
+    return timed(lambda: [fn(name) for name in names], repeat) / len(names)
+
+def run(path: str, habits: int, events: int, writes: int, repeat: int, seed: int) -> dict:
+    """
+    :return: dict: metric name to {"value": ..., "unit": ...}
+    """
+    results = {}
+    db = sqlite3.connect(path)
+    database.create_tables(db)
+
+    start = time.perf_counter()
+    specs = synthetic.generate(db, habits, events, seed)
+    results["increment_counter_many"] = {"value": events / (time.perf_counter() - start), "unit": "per_second"}
+
+    # single check-ins after the history, on a habit of every period type
+    ids = [database.find_counter_by_name(db, name) for name, _, _ in specs[:3]]
+    last = db.execute("SELECT MAX(timestamp) FROM tracker").fetchone()[0]
+    ts = database.from_epoch(last) + timedelta(days=1)
+    start = time.perf_counter()
+    for i in range(writes):
+        database.increment_counter(db, ids[i % len(ids)], ts + timedelta(minutes=i))
+    results["increment_counter"] = {"value": writes / (time.perf_counter() - start), "unit": "per_second"}
+    db.execute("DELETE FROM tracker WHERE timestamp >= ?", (database.to_epoch(ts),))
+    db.commit()
+
+    now = ts
+    results["count_events"] = {"value": per_habit(lambda name: analyse.count_events(db, name), specs, repeat), "unit": "ms"}
+    results["streak_analyse"] = {"value": per_habit(lambda name: analyse.streak_analyse(db, name), specs, repeat), "unit": "ms"}
+    results["current_streak"] = {"value": per_habit(lambda name: analyse.current_streak(db, name, now), specs, repeat), "unit": "ms"}
+    db.close()
+
+    def longest():
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert cli.main(["--db", path, "streak", "--all"]) == 0
+    results["cli_streak_all"] = {"value": timed(longest, repeat), "unit": "ms"}
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints the change of every metric against the baseline.
+    :return: list: names of the metrics that got worse by more than `threshold`
+    """
+    regressions = []
+    print(f"{'metric':<24} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["value"] / before["value"] - 1
+        worse = -change if HIGHER_IS_BETTER[result["unit"]] else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<24} {before['value']:>12.3f} {result['value']:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=30)
+    parser.add_argument("--events", type=int, default=300_000, help="events in total")
+    parser.add_argument("--writes", type=int, default=2000, help="single check-ins to time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(os.path.join(tmp, "bench.db"), args.habits, args.events, args.writes, args.repeat, args.seed)
+
+    report = {
+        "params": {key: getattr(args, key) for key in ("habits", "events", "writes", "repeat", "seed")},
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "machine": platform.machine()},
+        "results": results,
+    }
+    for name, result in results.items():
+        print(f"{name:<24} {result['value']:>12.3f} {result['unit']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != report["params"]:
+            print(f"warning: the baseline was run with {baseline['params']}", file=sys.stderr)
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
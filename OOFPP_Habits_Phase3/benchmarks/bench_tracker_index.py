@@ -0,0 +1,68 @@
+"""
+Per-habit query latency vs. tracker size, with and without the
+(counter_id, timestamp) index on tracker.
+
+Run from the project folder:
+    python benchmarks/bench_tracker_index.py
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db as database
+
+HABITS = 50
+QUERIES = 20
+
+def fill(db, size):
+    """
+    Seeds HABITS daily habits and `size` events spread randomly over them.
+    """
+    for i in range(HABITS):
+        database.add_counter(db, f"habit-{i}", "benchmark", database.PERIOD_DAILY, 1)
+    start = datetime(2020, 1, 1)
+    rnd = random.Random(size)
+    rows = (
+        (rnd.randint(1, HABITS), database.to_epoch(start + timedelta(minutes=rnd.randint(0, 2_000_000))))
+        for _ in range(size)
+    )
+    db.executemany("INSERT INTO tracker (counter_id, timestamp) VALUES (?, ?)", rows)
+    db.commit()
+
+def time_queries(db):
+    """
+    :return: float: mean latency of get_counter_data in milliseconds
+    """
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        database.get_counter_data(db, i % HABITS + 1)
+    return (time.perf_counter() - start) / QUERIES * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'no index ms':>12} {'index ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = sqlite3.connect(os.path.join(tmp, "bench.db"))
+            database.create_tables(db)
+            fill(db, size)
+
+            db.execute("DROP INDEX idx_tracker_counter_timestamp")
+            without_index = time_queries(db)
+            database.MIGRATIONS[0](db.cursor())
+            with_index = time_queries(db)
+            db.close()
+        print(f"{size:>10} {without_index:>12.2f} {with_index:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Export and import of a seeded synthetic database (see synthetic.py) in every
+available format, against checking off the same events one by one with
+counter.add_event (timed on a sample) and with increment_counter_many.
+
+Run from the project folder:
+    python benchmarks/bench_transfer.py [--events 300000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db as database
+import synthetic
+import transfer
+from counter import add_event
+
+def fresh_db(path, specs):
+    db = database.get_db(path)
+    for name, period_type, period_count in specs:
+        database.add_counter(db, name, "synthetic", period_type, period_count)
+    return db
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=30)
+    parser.add_argument("--events", type=int, default=300_000)
+    parser.add_argument("--sample", type=int, default=5000, help="events checked off one by one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    formats = ["jsonl", "npz"] + (["arrow"] if transfer.pa is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        source = database.get_db(os.path.join(tmp, "source.db"))
+        specs = synthetic.generate(source, args.habits, args.events, args.seed)
+        names = {_id: name for name, _id in database.get_counter_ids(source).items()}
+        rows = source.execute("SELECT counter_id, timestamp FROM tracker ORDER BY id").fetchall()
+
+        print(f"{'path':<24} {'seconds':>8} {'us/event':>9} {'MB':>7}")
+        for fmt in formats:
+            path = os.path.join(tmp, "export." + fmt)
+            start = time.perf_counter()
+            transfer.export_database(source, path)
+            seconds = time.perf_counter() - start
+            print(f"{'export ' + fmt:<24} {seconds:>8.2f} {seconds / len(rows) * 1e6:>9.2f} "
+                  f"{os.path.getsize(path) / 1e6:>7.1f}")
+
+            target = database.get_db(os.path.join(tmp, f"import-{fmt}.db"))
+            start = time.perf_counter()
+            transfer.import_database(target, path)
+            seconds = time.perf_counter() - start
+            print(f"{'import ' + fmt:<24} {seconds:>8.2f} {seconds / len(rows) * 1e6:>9.2f}")
+            target.close()
+
+        target = fresh_db(os.path.join(tmp, "many.db"), specs)
+        start = time.perf_counter()
+        database.increment_counter_many(target, ((c, database.from_epoch(ts)) for c, ts in rows))
+        seconds = time.perf_counter() - start
+        print(f"{'increment_counter_many':<24} {seconds:>8.2f} {seconds / len(rows) * 1e6:>9.2f}")
+        target.close()
+
+        target = fresh_db(os.path.join(tmp, "single.db"), specs)
+        sample = rows[:args.sample]
+        start = time.perf_counter()
+        for counter_id, ts in sample:
+            add_event(names[counter_id], target, database.from_epoch(ts))
+        seconds = time.perf_counter() - start
+        print(f"{'add_event':<24} {seconds / len(sample) * len(rows):>8.2f} "
+              f"{seconds / len(sample) * 1e6:>9.2f}  (extrapolated)")
+        target.close()
+        source.close()
+
+if __name__ == "__main__":
+    main()
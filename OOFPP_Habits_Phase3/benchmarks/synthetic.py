@@ -0,0 +1,71 @@
+"""
+Seeded synthetic habit data for the benchmarks.
+
+The habits cycle through daily, weekly and monthly periods with 1-3
+required check-ins. Each habit gets its share of the events, spaced so that
+most periods meet the requirement and some are missed, which gives streaks
+of varying length. The same seed always produces the same database.
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db as database
+
+START = datetime(2015, 1, 1)
+
+# mean length of a period in hours
+PERIOD_HOURS = {
+    database.UnitNames.PERIOD_DAILY: 24,
+    database.UnitNames.PERIOD_WEEKLY: 7 * 24,
+    database.UnitNames.PERIOD_MONTHLY: 30 * 24,
+}
+
+def habit_specs(habits: int, seed: int = 0) -> list:
+    """
+    :return: list: (name, period_type, period_count) of the synthetic habits
+    """
+    rnd = random.Random(seed)
+    period_types = list(database.UnitNames)
+    return [
+        (f"habit-{i}", period_types[i % len(period_types)], rnd.randint(1, 3))
+        for i in range(habits)
+    ]
+
+def habit_events(period_type: database.UnitNames, period_count: int, events: int, rnd: random.Random):
+    """
+    Generator of `events` ascending check-in times of one habit.
+    """
+    mean_gap = PERIOD_HOURS[period_type] / period_count
+    ts = START
+    for _ in range(events):
+        # mostly on time, now and then late enough to miss a period
+        ts += timedelta(hours=rnd.uniform(0.2, 1.5) * mean_gap)
+        yield ts
+
+def generate(db, habits: int, events: int, seed: int = 0) -> list:
+    """
+    Creates `habits` habits with `events` events in total (split evenly)
+    in an empty database, inserting the events in one bulk transaction.
+    :return: list: the habit specs from habit_specs
+    """
+    specs = habit_specs(habits, seed)
+    per_habit = -(-events // habits)
+    for name, period_type, period_count in specs:
+        if per_habit * PERIOD_HOURS[period_type] / period_count * 1.5 > 7000 * 365 * 24:
+            raise ValueError(f"{per_habit} events of {name} don't fit into the calendar, use more habits")
+    rnd = random.Random(seed)
+    ids = [database.add_counter(db, name, "synthetic", period_type, period_count)
+           for name, period_type, period_count in specs]
+
+    def rows():
+        for i, (_id, (_, period_type, period_count)) in enumerate(zip(ids, specs)):
+            share = events // habits + (i < events % habits)
+            for ts in habit_events(period_type, period_count, share, rnd):
+                yield _id, ts
+
+    database.increment_counter_many(db, rows())
+    return specs
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+import db as database
+
+# outcome of one compact() run; sizes are page_count * page_size of the main database
+CompactionReport = namedtuple("CompactionReport", [
+    "horizon", "rows_compacted", "days_compacted", "rows_archived", "archive_path",
+    "bytes_before", "bytes_after", "bytes_reclaimed", "pages_vacuumed",
+])
+
+def database_bytes(db) -> int:
+    """
+    Size of the database: allocated pages times the page size.
+    """
+    return db.execute("PRAGMA page_count").fetchone()[0] * db.execute("PRAGMA page_size").fetchone()[0]
+
+def retention_horizon(days: int, now: datetime = None) -> datetime:
+    """
+    Midnight `days` days before now: the raw check-ins older than that are compacted.
+    """
+    now = now or datetime.now()
+    return datetime(now.year, now.month, now.day) - timedelta(days=days)
+
+def _archive_schema(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS archive.counter (
+        id INTEGER PRIMARY KEY,
+        tenant TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        period_type INTEGER NOT NULL,
+        period_count INTEGER NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS archive.tracker (
+        id INTEGER PRIMARY KEY,
+        counter_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS archive.idx_tracker_counter_timestamp ON tracker (counter_id, timestamp)")
+
+def compact(db, horizon: datetime, archive_path: str = None, vacuum_step: int = 1024,
+            analysis_limit: int = 1000) -> CompactionReport:
+    """
+    Rolls the raw check-ins older than `horizon` (rounded down to midnight)
+    into per-day counts in tracker_compacted and removes them from tracker.
+
+    The per-period rollup keeps counting the compacted check-ins, so the
+    streaks and the total counts stay exactly the same; counts over a time
+    range include a compacted day when the day lies completely inside it.
+    Only the time of day of the old check-ins is lost, unless `archive_path`
+    is given: the raw rows are then copied into that SQLite file (tables
+    counter and tracker, with their original IDs) before they are removed.
+    The copy skips rows that are already archived, so an interrupted run can
+    simply be repeated.
+
+    Afterwards the freed pages are given back `vacuum_step` pages per commit
+    (databases created with auto_vacuum = INCREMENTAL, see db.PRAGMAS; older
+    files keep their free pages for reuse until a full VACUUM), and the
+    statistics of the changed tables are refreshed with ANALYZE limited to
+    `analysis_limit` rows per index.
+
+    Must not run inside a db.transaction() block.
+    :return: CompactionReport: rows, days and bytes reclaimed
+    """
+    if database.in_transaction(db):
+        raise ValueError("compact() can't run inside a transaction")
+    horizon = datetime(horizon.year, horizon.month, horizon.day)
+    before = database.to_epoch(horizon)
+    db.commit()
+    bytes_before = database_bytes(db)
+    cur = db.cursor()
+
+    rows_archived = 0
+    if archive_path is not None:
+        cur.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        try:
+            _archive_schema(cur)
+            cur.execute("""
+            INSERT OR REPLACE INTO archive.counter (id, tenant, name, description, period_type, period_count)
+            SELECT id, tenant, name, description, period_type, period_count FROM counter
+            WHERE id IN (SELECT DISTINCT counter_id FROM tracker WHERE timestamp < ?)
+            """, (before,))
+            cur.execute("""
+            INSERT OR IGNORE INTO archive.tracker (id, counter_id, timestamp)
+            SELECT id, counter_id, timestamp FROM tracker WHERE timestamp < ?
+            """, (before,))
+            rows_archived = cur.rowcount
+            db.commit()
+        except BaseException:
+            db.rollback()
+            # the original error matters, not a failing DETACH
+            with suppress(sqlite3.Error):
+                cur.execute("DETACH DATABASE archive")
+            raise
+        cur.execute("DETACH DATABASE archive")
+
+    rows_compacted, days_compacted = database.compact_events(db, before)
+
+    pages_vacuumed = incremental_vacuum(db, vacuum_step)
+    cur.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+    for table in ("tracker", "tracker_period_rollup", "tracker_compacted"):
+        cur.execute(f"ANALYZE {table}")
+    db.commit()
+
+    bytes_after = database_bytes(db)
+    return CompactionReport(
+        horizon, rows_compacted, days_compacted, rows_archived,
+        os.path.abspath(archive_path) if archive_path else None,
+        bytes_before, bytes_after, bytes_before - bytes_after, pages_vacuumed,
+    )
+
+def incremental_vacuum(db, step: int = 1024) -> int:
+    """
+    Returns the free pages of the database to the file system, `step` pages
+    per commit, so other connections get the write lock in between.
+    Does nothing unless the database uses auto_vacuum = INCREMENTAL.
+    :return: int: the number of pages given back
+    """
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    while True:
+        free = db.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            return freed
+        db.execute(f"PRAGMA incremental_vacuum({min(free, step)})").fetchall()
+        db.commit()
+        freed += free - db.execute("PRAGMA freelist_count").fetchone()[0]
@@ -1,16 +1,24 @@
-from db import add_counter, increment_counter, delete_counter, UnitNames, find_counter_by_name
+import csv
+import json
+from db import (add_counter, increment_counter, increment_counter_many, delete_counter,
+                UnitNames, find_counter_by_name, get_counter_ids)
 from datetime import datetime
 
 class Counter:
+    # fixed attributes keep the many instances of a loaded EventStore small
+    __slots__ = ("id", "name", "description", "period_type", "period_count", "count")
 
-    def __init__(self, name: str, description: str, period_type: UnitNames, period_count: int):
+    def __init__(self, name: str, description: str, period_type: UnitNames, period_count: int,
+                 _id: int = None):
         """
         Counter class for counting habits.
             :param name: name of the habit
             :param description: description of the habit
             :param period_type: type of periodicity (daily, weekly, monthly)
             :param period_count: number of times per chosen period
+            :param _id: ID of the habit in the database, if it is stored already
         """
+        self.id = _id
         self.name = name
         self.description = description
         self.period_type = UnitNames(period_type)
@@ -27,23 +35,66 @@ class Counter:
         """
         return f"{self.name}: {self.count} — {self.period_count}× per {self.period_type.label}"
 
-def add_event(habit_name: str, db, date: datetime = None):
+def add_event(habit_name: str, db, date: datetime = None, tenant: str = ""):
     """
     Add event to habit (check-off the task) by given name, raises increment_counter function.
     :param habit_name: name of the habit in the database
     :param db: a database connection
     :param date: a date of checking-off in datetime format
+    :param tenant: the user owning the habit, '' for the single-user database
     :return: None: increments the counter of events
     """
-    row = find_counter_by_name(db, habit_name)
+    row = find_counter_by_name(db, habit_name, tenant)
     if row is None:
         raise ValueError(f"No such habit: {habit_name!r}")
     counter_id = row
     increment_counter(db, counter_id, date)
 
-def delete_event(db, name: str):
+def add_events(db, events, tenant: str = "") -> int:
+    """
+    Add many events at once (bulk check-off). The habit names are resolved
+    with a single query and all events are written in one transaction,
+    so either all of them are recorded or none.
+    :param db: a database connection
+    :param events: iterable of (habit_name, datetime) pairs, may be a generator
+    :param tenant: the user owning the habits, '' for the single-user database
+    :return: int: the number of recorded events
+    """
+    ids = get_counter_ids(db, tenant)
+
+    def resolve():
+        for habit_name, date in events:
+            counter_id = ids.get(habit_name)
+            if counter_id is None:
+                raise ValueError(f"No such habit: {habit_name!r}")
+            yield counter_id, date or datetime.now()
+
+    return increment_counter_many(db, resolve())
+
+def read_events_csv(path: str):
+    """
+    Stream events from a CSV file with the header `name,timestamp`.
+    :return: generator of (habit_name, datetime) pairs for add_events
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row["name"], datetime.fromisoformat(row["timestamp"])
+
+def read_events_jsonl(path: str):
+    """
+    Stream events from a JSON lines file, one {"name": ..., "timestamp": ...} object per line.
+    :return: generator of (habit_name, datetime) pairs for add_events
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield row["name"], datetime.fromisoformat(row["timestamp"])
+
+def delete_event(db, name: str, tenant: str = ""):
     """
     Delete a habit and all its records.
     """
-    _id = find_counter_by_name(db, name)
+    _id = find_counter_by_name(db, name, tenant)
     delete_counter(db, _id)
@@ -1,6 +1,12 @@
+import itertools
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from enum import IntEnum
+from pathlib import Path
 
 class UnitNames(IntEnum):
     PERIOD_DAILY   = 1
@@ -15,12 +21,17 @@ PERIOD_DAILY = UnitNames.PERIOD_DAILY
 PERIOD_WEEKLY = UnitNames.PERIOD_WEEKLY
 PERIOD_MONTHLY = UnitNames.PERIOD_MONTHLY
 
-def get_habit_names(db):
+# tracker timestamps are seconds since EPOCH, see to_epoch
+EPOCH = datetime(1970, 1, 1)
+_EPOCH_DAY = EPOCH.toordinal()
+_SECOND = timedelta(seconds=1)
+
+def get_habit_names(db, tenant: str = ""):
     """
-    Fetches the names of all the habits in the database.
+    Fetches the names of all the habits of the tenant ('' for the single-user database).
     """
     cursor = db.cursor()
-    cursor.execute("SELECT name FROM counter")
+    cursor.execute("SELECT name FROM counter WHERE tenant = ?", (tenant,))
     rows = cursor.fetchall()
     if not rows:
         return []
@@ -36,14 +47,107 @@ def exist(db, _id):
         return True
     return False
 
-def get_db(name="main.db"):
-    import os
-    print(os.path.abspath(name))
-    db = sqlite3.connect(name)
-    db.execute("PRAGMA foreign_keys = ON;")
+# Pragmas applied to every connection opened by connect. Deployments can change them
+# here or per call; a value of None leaves the SQLite default in place.
+# WAL lets readers run alongside the writer, NORMAL sync is safe with WAL and skips
+# an fsync per commit, negative cache_size is in KiB. auto_vacuum only takes effect
+# for new files and has to come before journal_mode; INCREMENTAL lets compaction.py
+# return freed pages to the file system step by step.
+PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "cache_size": -16384,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+def connect(name="main.db", read_only=False, check_same_thread=True, **pragmas):
+    """
+    Opens a connection to the database file and applies PRAGMAS.
+    :param name: path of the database file
+    :param read_only: open the file in read-only mode (the file must exist)
+    :param check_same_thread: passed on to sqlite3.connect, False for pooled connections
+    :param pragmas: overrides of PRAGMAS for this connection
+    :return: the connection, the tables are not created here
+    """
+    if read_only:
+        uri = Path(name).resolve().as_uri() + "?mode=ro"
+        db = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread, factory=Connection)
+    else:
+        db = sqlite3.connect(name, check_same_thread=check_same_thread, factory=Connection)
+    for pragma, value in {**PRAGMAS, **pragmas}.items():
+        if value is None or (read_only and pragma in ("journal_mode", "auto_vacuum")):
+            continue
+        db.execute(f"PRAGMA {pragma} = {value}")
+    return db
+
+def get_db(name="main.db", **pragmas):
+    """
+    Opens the database with the tuned pragmas and creates or upgrades the tables.
+    """
+    db = connect(name, **pragmas)
     create_tables(db)
     return db
 
+class ConnectionPool:
+    """
+    Thread-safe set of connections to one database file: a single writer
+    connection guarded by a lock and a pool of read-only connections,
+    which WAL mode lets run in parallel with the writer.
+
+        pool = ConnectionPool("main.db", readers=4)
+        with pool.reader() as db:
+            count_counter_events(db, 1)
+        with pool.writer() as db:
+            increment_counter(db, 1, datetime.now())
+    """
+
+    def __init__(self, name="main.db", readers=4, **pragmas):
+        """
+        :param name: path of the database file, created with its tables if missing
+        :param readers: int: the number of read connections
+        :param pragmas: overrides of PRAGMAS for all the connections
+        """
+        self.name = name
+        self._writer = get_db(name, check_same_thread=False, **pragmas)
+        self._write_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(connect(name, read_only=True, check_same_thread=False, **pragmas))
+
+    @contextmanager
+    def reader(self, timeout=None):
+        """
+        Borrows a read connection, waiting up to `timeout` seconds for a free one.
+        """
+        db = self._readers.get(timeout=timeout)
+        try:
+            yield db
+        finally:
+            # end the read transaction so the next borrower sees new commits
+            if db.in_transaction:
+                db.rollback()
+            self._readers.put(db)
+
+    @contextmanager
+    def writer(self):
+        """
+        Gives exclusive use of the writer connection.
+        """
+        with self._write_lock:
+            yield self._writer
+
+    def close(self):
+        """
+        Closes all the connections of the pool.
+        """
+        with self._write_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
 def create_tables(db):
     """
     Initial creation of tables counter and tracker.
@@ -73,32 +177,383 @@ def create_tables(db):
     """)
 
     db.commit()
+    migrate(db)
 
 
-def add_counter(db, name, description, period_type: UnitNames, period_count):
+def _migration_tracker_index(cur):
+    """
+    Covering index for the per-habit queries on tracker, so fetching
+    the events of one habit is a range scan instead of a full table scan.
+    """
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_tracker_counter_timestamp
+        ON tracker (counter_id, timestamp)
+    """)
+
+def _migration_counter_name_index(cur):
+    """
+    Covering index on counter.name that also carries the metadata columns,
+    so the lookups by name never have to touch the table itself. It is not
+    UNIQUE: the UNIQUE constraint of the name column already enforces that.
+    """
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_counter_name
+        ON counter (name, id, period_type, period_count)
+    """)
+
+def _text_period_ordinal_sql(ts: str, period_type: str) -> str:
+    """
+    period_ordinal_sql for the TEXT timestamps tracker had before schema version 5.
+    """
+    day = f"CAST(julianday(date({ts})) - 1721424.5 AS INTEGER)"
+    return f"""CASE {period_type}
+        WHEN 1 THEN {day}
+        WHEN 2 THEN ({day} - 1) / 7
+        ELSE CAST(strftime('%Y', {ts}) AS INTEGER) * 12 + CAST(strftime('%m', {ts}) AS INTEGER) - 1
+    END"""
+
+def day_ordinal_sql(ts: str) -> str:
+    """
+    SQL expression of the day ordinal (date.toordinal) of an epoch timestamp,
+    floored, so also right before 1970.
+    """
+    return f"(({ts} - ({ts} % 86400 + 86400) % 86400) / 86400 + {_EPOCH_DAY})"
+
+def period_ordinal_sql(ts: str, period_type: str) -> str:
+    """
+    SQL expression mapping an epoch timestamp to its period ordinal,
+    the same numbers analyse.period_ordinal computes in Python:
+    day ordinal (date.toordinal), Monday-based week ordinal, year * 12 + month - 1.
+    Days and weeks are pure integer arithmetic.
+    :param ts: SQL expression of the timestamp in epoch seconds
+    :param period_type: SQL expression of the period type (1, 2, 3)
+    """
+    day = day_ordinal_sql(ts)
+    return f"""CASE {period_type}
+        WHEN 1 THEN {day}
+        WHEN 2 THEN ({day} - 1) / 7
+        ELSE CAST(strftime('%Y', {ts}, 'unixepoch') AS INTEGER) * 12
+            + CAST(strftime('%m', {ts}, 'unixepoch') AS INTEGER) - 1
+    END"""
+
+def _migration_period_rollup(cur):
+    """
+    Per-period event counts of every habit, kept up to date by triggers on
+    tracker, so the streak analysis reads one row per period instead of one
+    row per event.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tracker_period_rollup (
+        counter_id INTEGER NOT NULL,
+        period_ordinal INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (counter_id, period_ordinal),
+        FOREIGN KEY(counter_id) REFERENCES counter(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+    _create_rollup_triggers(cur, _text_period_ordinal_sql)
+    _rebuild_period_rollup(cur, _text_period_ordinal_sql)
+
+def _create_rollup_triggers(cur, ordinal_sql):
+    new_ordinal = ordinal_sql("NEW.timestamp", "(SELECT period_type FROM counter WHERE id = NEW.counter_id)")
+    old_ordinal = ordinal_sql("OLD.timestamp", "(SELECT period_type FROM counter WHERE id = OLD.counter_id)")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tracker_rollup_insert AFTER INSERT ON tracker
+    BEGIN
+        INSERT INTO tracker_period_rollup (counter_id, period_ordinal, count)
+        VALUES (NEW.counter_id, {new_ordinal}, 1)
+        ON CONFLICT (counter_id, period_ordinal) DO UPDATE SET count = count + 1;
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_tracker_rollup_delete AFTER DELETE ON tracker
+    BEGIN
+        UPDATE tracker_period_rollup SET count = count - 1
+        WHERE counter_id = OLD.counter_id AND period_ordinal = {old_ordinal};
+        DELETE FROM tracker_period_rollup
+        WHERE counter_id = OLD.counter_id AND period_ordinal = {old_ordinal} AND count <= 0;
+    END
+    """)
+
+def _rebuild_period_rollup(cur, ordinal_sql=period_ordinal_sql):
+    cur.execute("DELETE FROM tracker_period_rollup")
+    cur.execute(f"""
+    INSERT INTO tracker_period_rollup (counter_id, period_ordinal, count)
+    SELECT t.counter_id, {ordinal_sql("t.timestamp", "c.period_type")} AS ordinal, COUNT(*)
+    FROM tracker t JOIN counter c ON c.id = t.counter_id
+    GROUP BY t.counter_id, ordinal
+    """)
+
+def rebuild_period_rollup(db):
+    """
+    Recomputes tracker_period_rollup from the raw events in tracker and the
+    compacted day counts, and makes commit to the database.
+    """
+    cur = db.cursor()
+    _rebuild_period_rollup(cur)
+    day_start = f"((k.day_ordinal - {_EPOCH_DAY}) * 86400)"
+    cur.execute(f"""
+    INSERT INTO tracker_period_rollup (counter_id, period_ordinal, count)
+    SELECT k.counter_id, {period_ordinal_sql(day_start, "c.period_type")} AS ordinal, SUM(k.count)
+    FROM tracker_compacted k JOIN counter c ON c.id = k.counter_id
+    WHERE true
+    GROUP BY k.counter_id, ordinal
+    ON CONFLICT (counter_id, period_ordinal) DO UPDATE SET count = count + excluded.count
+    """)
+    _commit(db)
+
+def _migration_streak_cache(cur):
+    """
+    Persisted streak results. Any write to tracker drops the cached row of
+    the habit, also writes made by other processes or outside of this module;
+    the in-process cache re-saves it after an incremental update.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS streak_cache (
+        counter_id INTEGER PRIMARY KEY,
+        last_event_id INTEGER,
+        longest INTEGER NOT NULL,
+        run INTEGER NOT NULL,
+        last_good INTEGER,
+        FOREIGN KEY(counter_id) REFERENCES counter(id) ON DELETE CASCADE
+    )
+    """)
+    _create_streak_cache_triggers(cur)
+
+def _create_streak_cache_triggers(cur):
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_tracker_streak_cache_insert AFTER INSERT ON tracker
+    BEGIN
+        DELETE FROM streak_cache WHERE counter_id = NEW.counter_id;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_tracker_streak_cache_delete AFTER DELETE ON tracker
+    BEGIN
+        DELETE FROM streak_cache WHERE counter_id = OLD.counter_id;
+    END
+    """)
+
+def _migration_tracker_epoch(cur):
+    """
+    Stores tracker.timestamp as INTEGER seconds since 1970-01-01 instead of
+    TEXT, so range conditions compare numbers and the analysis buckets
+    timestamps with integer arithmetic. The wall-clock time is kept as it was
+    recorded, without time zone conversion. The view tracker_text shows the
+    events with the old 'YYYY-MM-DD HH:MM:SS' strings.
+    """
+    cur.execute("""
+    CREATE TABLE tracker_epoch (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        counter_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        FOREIGN KEY(counter_id) REFERENCES counter(id) ON DELETE CASCADE
+    )
+    """)
+    cur.execute("""
+    INSERT INTO tracker_epoch (id, counter_id, timestamp)
+    SELECT id, counter_id, CAST(strftime('%s', timestamp) AS INTEGER) FROM tracker
+    """)
+    # keep the AUTOINCREMENT counter, IDs of deleted events must not be reused
+    cur.execute("DELETE FROM sqlite_sequence WHERE name = 'tracker_epoch'")
+    cur.execute("""
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'tracker_epoch', seq FROM sqlite_sequence WHERE name = 'tracker'
+    """)
+    # dropping the table also drops its index and triggers, they are recreated below;
+    # the rollup and the cached streaks stay valid as the events keep their IDs and periods
+    cur.execute("DROP TABLE tracker")
+    cur.execute("ALTER TABLE tracker_epoch RENAME TO tracker")
+    _migration_tracker_index(cur)
+    _create_rollup_triggers(cur, period_ordinal_sql)
+    _create_streak_cache_triggers(cur)
+    cur.execute("""
+    CREATE VIEW IF NOT EXISTS tracker_text AS
+    SELECT id, counter_id, datetime(timestamp, 'unixepoch') AS timestamp FROM tracker
+    """)
+
+def _migration_counter_tenant(cur):
+    """
+    Adds the tenant (user) of every habit, so one database file can hold the
+    habits of many users (see shards.py): names are unique per tenant instead
+    of globally. The existing habits belong to the default tenant ''.
+    """
+    cur.execute("DROP TABLE IF EXISTS counter_tenant")
+    cur.execute("""
+    CREATE TABLE counter_tenant (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tenant TEXT NOT NULL DEFAULT '',
+        name TEXT NOT NULL,
+        description TEXT,
+        period_type INTEGER NOT NULL CHECK(period_type IN (1,2,3)),
+        period_count INTEGER NOT NULL,
+        UNIQUE (tenant, name)
+    )
+    """)
+    cur.execute("""
+    INSERT INTO counter_tenant (id, name, description, period_type, period_count)
+    SELECT id, name, description, period_type, period_count FROM counter
+    """)
+    cur.execute("DELETE FROM sqlite_sequence WHERE name = 'counter_tenant'")
+    cur.execute("""
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'counter_tenant', seq FROM sqlite_sequence WHERE name = 'counter'
+    """)
+    # the rollup triggers read counter, they would block the rename while it is missing;
+    # migrate() runs with the foreign keys off, so the drop doesn't cascade to the events
+    cur.execute("DROP TRIGGER IF EXISTS trg_tracker_rollup_insert")
+    cur.execute("DROP TRIGGER IF EXISTS trg_tracker_rollup_delete")
+    cur.execute("DROP TABLE counter")
+    cur.execute("ALTER TABLE counter_tenant RENAME TO counter")
+    _create_rollup_triggers(cur, period_ordinal_sql)
+    _create_counter_name_index(cur)
+
+def _create_counter_name_index(cur):
+    # covering index of the metadata lookups, the UNIQUE (tenant, name) constraint
+    # has its own index, so this one doesn't need to be unique
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_counter_name
+        ON counter (tenant, name, id, period_type, period_count)
+    """)
+
+def _migration_tracker_compacted(cur):
+    """
+    Per-day event counts of the check-ins that compaction.py removed from
+    tracker. The rollup keeps counting them, so streaks don't change, and the
+    event counts add them for the days that lie completely inside a range.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tracker_compacted (
+        counter_id INTEGER NOT NULL,
+        day_ordinal INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (counter_id, day_ordinal),
+        FOREIGN KEY(counter_id) REFERENCES counter(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+
+def _migration_counter_name_index_plain(cur):
+    """
+    Replaces the UNIQUE idx_counter_name of schema versions 6 and 7 with a plain
+    covering index: the uniqueness was already enforced by the table constraint,
+    and every insert paid for the check twice.
+    """
+    cur.execute("DROP INDEX IF EXISTS idx_counter_name")
+    _create_counter_name_index(cur)
+
+def _migration_rollup_delete_trigger(cur):
+    """
+    Re-creates the delete trigger of the rollup so that it only looks at the
+    period of the deleted event when it drops emptied rows; before, every
+    deleted event scanned all periods of its habit.
+    """
+    cur.execute("DROP TRIGGER IF EXISTS trg_tracker_rollup_delete")
+    _create_rollup_triggers(cur, period_ordinal_sql)
+
+def _migration_metadata_version(cur):
+    """
+    Adds metadata_version, a single row counting the changes of the counter
+    table. The triggers keep it up to date for every writer, also for other
+    processes, so the metadata cache can tell when its entries are stale.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS metadata_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO metadata_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_counter_metadata_{event.lower()} AFTER {event} ON counter
+        BEGIN
+            UPDATE metadata_version SET version = version + 1 WHERE id = 1;
+        END
+        """)
+
+# Ordered list of schema migrations. The position in the list (starting at 1)
+# is the schema version stored in PRAGMA user_version after the step is applied.
+# New steps must only ever be appended.
+MIGRATIONS = [
+    _migration_tracker_index,
+    _migration_counter_name_index,
+    _migration_period_rollup,
+    _migration_streak_cache,
+    _migration_tracker_epoch,
+    _migration_counter_tenant,
+    _migration_tracker_compacted,
+    _migration_counter_name_index_plain,
+    _migration_rollup_delete_trigger,
+    _migration_metadata_version,
+]
+
+def schema_version(db):
+    """
+    Reads the schema version of the database from PRAGMA user_version.
+    """
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db):
+    """
+    Applies all the pending migrations in order.
+    Every step is committed together with the new version number,
+    so an interrupted upgrade resumes from the last finished step.
+    :return: int: the schema version after the migration
+    """
+    version = schema_version(db)
+    if version >= len(MIGRATIONS):
+        return version
+    # steps that rebuild a table must not cascade deletes through the foreign keys;
+    # the setting can only change outside of a transaction
+    db.commit()
+    foreign_keys = db.execute("PRAGMA foreign_keys").fetchone()[0]
+    db.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            cur = db.cursor()
+            step(cur)
+            if cur.execute("PRAGMA foreign_key_check").fetchone() is not None:
+                raise sqlite3.IntegrityError(f"Migration {number} broke a foreign key")
+            cur.execute(f"PRAGMA user_version = {number}")
+            db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    return schema_version(db)
+
+
+def add_counter(db, name, description, period_type: UnitNames, period_count, tenant: str = ""):
     """
     Add habit to the database and makes commit to the database
+    (unless inside a transaction() block)
     :param db: database connection
     :param name: name of the habit
     :param description: text description of the habit
     :param period_type: enum value (day, week, month)
     :param period_count: int number of times per period type
+    :param tenant: the user owning the habit, '' for the single-user database
     :return: ID of the inserted row
     """
     cur = db.cursor()
     cur.execute(
-        "INSERT INTO counter (name, description, period_type, period_count) VALUES (?, ?, ?, ?)",
-        (name, description, period_type, period_count)
+        "INSERT INTO counter (tenant, name, description, period_type, period_count) VALUES (?, ?, ?, ?, ?)",
+        (tenant, name, description, period_type, period_count)
     )
-    db.commit()
+    _commit(db)
+    invalidate_metadata(db)
     return cur.lastrowid
 
-def group_by_period_type(db):
+def group_by_period_type(db, tenant: str = ""):
     """
-    Lists habits grouped by period type.
+    Lists the habits of the tenant grouped by period type.
     """
     cur = db.cursor()
-    cur.execute("SELECT period_type, GROUP_CONCAT(name) GroupedNames FROM counter GROUP BY period_type")
+    cur.execute("""
+    SELECT period_type, GROUP_CONCAT(name) GroupedNames FROM counter
+    WHERE tenant = ? GROUP BY period_type
+    """, (tenant,))
     return cur.fetchall()
 
 def get_period_count(db, _id):
@@ -123,18 +578,258 @@ def get_period_type(db, _id):
         return rows[0]
     return None
 
-def find_counter_by_name(db, name):
+def find_counter_by_name(db, name, tenant: str = ""):
     """
-    Fetches the ID of the habit with the given name.
+    Fetches the ID of the habit of the tenant with the given name (from the metadata cache).
     :return: the value of ID column for the first matching row, or None if no such habit exists.
     """
-    cur = db.cursor()
-    cur.execute("SELECT id FROM counter WHERE name = ?", (name,))
-    rows = cur.fetchone()
-    if rows is not None:
-        return rows[0]
+    habit = find_habit(db, name, tenant)
+    if habit is not None:
+        return habit.id
     return None
 
+# Static metadata of one habit, as kept by the metadata cache
+HabitMeta = namedtuple("HabitMeta", ["id", "name", "period_type", "period_count"])
+
+# Process-wide metadata cache: database key -> (metadata_version, {tenant: {habit name: HabitMeta}}).
+# A database is identified by its file, so all the connections to it share one entry.
+# add_counter, delete_counter and rolled back transactions drop the entry; changes
+# made by other processes are noticed through the metadata_version table.
+_metadata = {}
+# id(connection) -> {tenant: {habit name: HabitMeta}} of the connections whose open
+# transaction() block changed habits: until the commit only they see the changes
+_private_metadata = {}
+# id(connection) -> (connection, database key) of in-memory databases not opened by
+# connect(); the connection is referenced so its id can't be reused by another
+# connection while the entry exists (file databases need no entry, see database_key)
+_memory_keys = {}
+_MAX_MEMORY_CONNECTIONS = 64
+_memory_ids = itertools.count()
+
+class Connection(sqlite3.Connection):
+    """
+    The connections opened by connect. They remember their database_key, so
+    the caches don't ask SQLite for the file of the connection on every lookup.
+    """
+    database_key = None
+
+def database_key(db):
+    """
+    Identifies the database of the connection: its file path, or a key of its
+    own for in-memory databases. Caches use it to keep the data of several
+    databases apart.
+    """
+    key = getattr(db, "database_key", None)
+    if key is not None:
+        return key
+    entry = _memory_keys.get(id(db))
+    if entry is not None:
+        return entry[1]
+    # in-memory and temporary databases are private to their connection
+    key = db.execute("PRAGMA database_list").fetchone()[2] or ("memory", next(_memory_ids))
+    if isinstance(db, Connection):
+        db.database_key = key
+    elif isinstance(key, tuple):
+        if len(_memory_keys) >= _MAX_MEMORY_CONNECTIONS:
+            _, old_key = _memory_keys.pop(next(iter(_memory_keys)))
+            _metadata.pop(old_key, None)
+        _memory_keys[id(db)] = (db, key)
+    return key
+
+def get_habit_metadata(db, tenant: str = "") -> dict:
+    """
+    Metadata of all the habits of the tenant, loaded with one query and then served from the cache.
+    Inside a transaction the rows read are not shared with the other connections,
+    they may not be committed yet.
+    :return: dict: habit name to HabitMeta
+    """
+    tenants = _private_metadata.get(id(db))
+    if tenants is None:
+        version = metadata_version(db)
+        cached = _metadata.get(database_key(db))
+        # another connection, maybe of another process, changed the habits since
+        tenants = cached[1] if cached is not None and cached[0] == version else {}
+    habits = tenants.get(tenant)
+    if habits is None:
+        cur = db.cursor()
+        cur.execute("SELECT id, name, period_type, period_count FROM counter WHERE tenant = ?", (tenant,))
+        habits = {name: HabitMeta(_id, name, UnitNames(period_type), period_count)
+                  for _id, name, period_type, period_count in cur.fetchall()}
+        if id(db) in _private_metadata:
+            _private_metadata[id(db)][tenant] = habits
+        elif not db.in_transaction:
+            if cached is None or cached[0] != version:
+                _metadata[database_key(db)] = (version, tenants)
+            tenants[tenant] = habits
+    return habits
+
+def metadata_version(db):
+    """
+    Reads the change count of the counter table, see _migration_metadata_version.
+    :return: int, or None for databases without the table (not migrated, read-only)
+    """
+    try:
+        return db.execute("SELECT version FROM metadata_version WHERE id = 1").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def find_habit(db, name, tenant: str = ""):
+    """
+    Looks up the metadata of the habit of the tenant with the given name in the cache.
+    :return: HabitMeta or None if no such habit exists
+    """
+    return get_habit_metadata(db, tenant).get(name)
+
+def invalidate_metadata(db=None):
+    """
+    Drops the cached metadata of the database of the connection, or of all databases.
+    """
+    if db is None:
+        _metadata.clear()
+        return
+    _metadata.pop(database_key(db), None)
+    if in_transaction(db):
+        # the change isn't committed yet, see get_habit_metadata
+        _private_metadata[id(db)] = {}
+
+# Callables notified after events of a habit were written or removed, called as
+# listener(db, counter_id, event_id, event_time). event_id and event_time are None
+# when the change is not a single new event (bulk inserts, deleted habits).
+_event_listeners = []
+
+def add_event_listener(listener):
+    """
+    Registers a callable to be notified about changes of the tracker data.
+    """
+    if listener not in _event_listeners:
+        _event_listeners.append(listener)
+
+def remove_event_listener(listener):
+    """
+    Unregisters a callable registered with add_event_listener.
+    """
+    if listener in _event_listeners:
+        _event_listeners.remove(listener)
+
+def _notify(db, counter_id, event_id=None, event_time: datetime = None):
+    state = _transactions.get(id(db))
+    if state is not None:
+        state[1].add(counter_id)
+    for listener in _event_listeners:
+        listener(db, counter_id, event_id, event_time)
+
+# Open transaction() blocks per connection: id(connection) -> [nesting depth, IDs of
+# the habits written to]. The entry only exists while a block is running.
+_transactions = {}
+
+@contextmanager
+def transaction(db):
+    """
+    Groups several writes into one unit of work:
+
+        with transaction(db):
+            add_counter(db, ...)
+            increment_counter(db, ...)
+
+    The functions of this module don't commit inside the block; the work is
+    committed once when the outermost block ends, or rolled back if it raises.
+    A nested block runs as a savepoint: when it raises, only its own writes are
+    undone, so the enclosing block can catch the error and carry on.
+    After a rollback the listeners are told to forget the touched habits.
+    """
+    state = _transactions.setdefault(id(db), [0, set()])
+    state[0] += 1
+    depth = state[0]
+    try:
+        if depth == 1:
+            yield db
+        else:
+            with _savepoint(db, f"transaction_{depth}"):
+                yield db
+    except BaseException:
+        if depth == 1:
+            db.rollback()
+        invalidate_metadata(db)
+        for counter_id in state[1]:
+            for listener in _event_listeners:
+                listener(db, counter_id, None, None)
+        raise
+    else:
+        if depth == 1:
+            db.commit()
+    finally:
+        state[0] -= 1
+        if state[0] == 0:
+            del _transactions[id(db)]
+            if _private_metadata.pop(id(db), None) is not None:
+                # committed or rolled back: other connections may have cached the old state
+                invalidate_metadata(db)
+
+def in_transaction(db) -> bool:
+    """
+    Tells if a transaction() block is open on the connection.
+    """
+    return id(db) in _transactions
+
+def _commit(db):
+    """
+    Commits, unless a transaction() block will do it later.
+    """
+    if not in_transaction(db):
+        db.commit()
+
+def _rollback(db):
+    """
+    Rolls back, unless it is left to the enclosing transaction() block.
+    """
+    if not in_transaction(db):
+        db.rollback()
+
+def to_epoch(event_time: datetime) -> int:
+    """
+    Converts a datetime to the way it is stored in the tracker table:
+    whole seconds since 1970-01-01 of its wall-clock time.
+    """
+    return (event_time.replace(tzinfo=None) - EPOCH) // _SECOND
+
+def from_epoch(seconds: int) -> datetime:
+    """
+    Converts a tracker timestamp back to a (naive) datetime.
+    """
+    return EPOCH + timedelta(seconds=seconds)
+
+def range_clause(since: datetime = None, until: datetime = None):
+    """
+    Builds the SQL condition for an optional time range on tracker.timestamp.
+    `since` is inclusive, `until` is exclusive.
+    :return: tuple: (sql fragment starting with AND, or empty string; list of parameters)
+    """
+    sql = ""
+    params = []
+    if since is not None:
+        sql += " AND timestamp >= ?"
+        params.append(to_epoch(since))
+    if until is not None:
+        sql += " AND timestamp < ?"
+        params.append(to_epoch(until))
+    return sql, params
+
+def compacted_day_clause(since: datetime = None, until: datetime = None):
+    """
+    Like range_clause for tracker_compacted.day_ordinal: only the days that lie
+    completely inside [since, until) are part of the range.
+    :return: tuple: (sql fragment starting with AND, or empty string; list of parameters)
+    """
+    sql = ""
+    params = []
+    if since is not None:
+        sql += " AND day_ordinal >= ?"
+        params.append(-(-to_epoch(since) // 86400) + _EPOCH_DAY)
+    if until is not None:
+        sql += " AND day_ordinal < ?"
+        params.append(to_epoch(until) // 86400 + _EPOCH_DAY)
+    return sql, params
+
 def increment_counter(db, counter_id, event_time: datetime):
     """
     Inserts the event entry with the timestamp into the tracker table.
@@ -142,27 +837,412 @@ def increment_counter(db, counter_id, event_time: datetime):
     if not event_time:
         event_time = datetime.now()
 
-    event_time_string = event_time.strftime("%Y-%m-%d %H:%M:%S")
-
     cur = db.cursor()
     cur.execute(
         "INSERT INTO tracker (counter_id, timestamp) VALUES (?, ?)",
-        (counter_id, event_time_string)
+        (counter_id, to_epoch(event_time))
     )
-    db.commit()
+    _commit(db)
+    _notify(db, counter_id, cur.lastrowid, event_time)
+
+def increment_counter_many(db, events) -> int:
+    """
+    Inserts many event entries into the tracker table with one executemany
+    and a single commit. Rolls back all of them if any insert fails, also
+    inside a transaction() block, where the events run as a savepoint and
+    the rest of the block is left to the caller.
+    :param events: iterable of (counter_id, datetime) pairs, consumed lazily
+    :return: int: the number of inserted events
+    """
+    touched = set()
+
+    def rows():
+        for counter_id, event_time in events:
+            touched.add(counter_id)
+            yield counter_id, to_epoch(event_time)
+
+    cur = db.cursor()
+    try:
+        with _savepoint(db, "increment_counter_many"):
+            cur.executemany("INSERT INTO tracker (counter_id, timestamp) VALUES (?, ?)", rows())
+    except Exception:
+        _rollback(db)
+        raise
+    _commit(db)
+    for counter_id in touched:
+        _notify(db, counter_id)
+    return cur.rowcount
+
+# triggers keeping the derived tables of tracker up to date row by row
+_TRACKER_TRIGGERS = (
+    "trg_tracker_rollup_insert", "trg_tracker_rollup_delete",
+    "trg_tracker_streak_cache_insert", "trg_tracker_streak_cache_delete",
+)
+
+@contextmanager
+def _savepoint(db, name: str):
+    """
+    Runs the block as a savepoint of the current transaction, which is begun
+    if none is open: when the block raises, only its own changes are undone
+    and the enclosing transaction stays usable.
+    """
+    if not db.in_transaction:
+        db.execute("BEGIN")
+    db.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        db.execute(f"ROLLBACK TO {name}")
+        db.execute(f"RELEASE {name}")
+        raise
+    db.execute(f"RELEASE {name}")
+
+def load_events(db, events) -> int:
+    """
+    Bulk load of imports: inserts the events with the per-row triggers of
+    tracker suspended and brings tracker_period_rollup and streak_cache up to
+    date afterwards with one grouped statement each, which makes large loads
+    several times faster than increment_counter_many. The triggers are
+    dropped and re-created inside a savepoint, so other connections never
+    see the table without them, and a failed load leaves neither rows nor
+    missing triggers behind, also when the caller catches the error inside a
+    transaction() block. All or nothing, like increment_counter_many.
+    :param events: iterable of (counter_id, epoch seconds) pairs, consumed lazily
+    :return: int: the number of inserted events
+    """
+    cur = db.cursor()
+    try:
+        with _savepoint(db, "load_events"):
+            last_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM tracker").fetchone()[0]
+            for trigger in _TRACKER_TRIGGERS:
+                cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            try:
+                cur.executemany("INSERT INTO tracker (counter_id, timestamp) VALUES (?, ?)", events)
+                inserted = cur.rowcount
+                cur.execute(f"""
+                INSERT INTO tracker_period_rollup (counter_id, period_ordinal, count)
+                SELECT t.counter_id, {period_ordinal_sql("t.timestamp", "c.period_type")} AS ordinal, COUNT(*)
+                FROM tracker t JOIN counter c ON c.id = t.counter_id
+                WHERE t.id > ?
+                GROUP BY t.counter_id, ordinal
+                ON CONFLICT (counter_id, period_ordinal) DO UPDATE SET count = count + excluded.count
+                """, (last_id,))
+                touched = [row[0] for row in cur.execute(
+                    "SELECT DISTINCT counter_id FROM tracker WHERE id > ?", (last_id,))]
+                cur.executemany("DELETE FROM streak_cache WHERE counter_id = ?", ((_id,) for _id in touched))
+            finally:
+                _create_rollup_triggers(cur, period_ordinal_sql)
+                _create_streak_cache_triggers(cur)
+    except Exception:
+        _rollback(db)
+        raise
+    _commit(db)
+    for counter_id in touched:
+        _notify(db, counter_id)
+    return inserted
+
+def add_compacted_days(db, days) -> int:
+    """
+    Adds per-day event counts (as compaction.py writes them) to
+    tracker_compacted and to the rollup, e.g. when importing a compacted history.
+    A failed call leaves nothing behind, like load_events.
+    :param days: iterable of (counter_id, day_ordinal, count) rows, consumed lazily
+    :return: int: the number of rows read
+    """
+    cur = db.cursor()
+    try:
+        with _savepoint(db, "add_compacted_days"):
+            cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS loaded_days (
+                counter_id INTEGER NOT NULL,
+                day_ordinal INTEGER NOT NULL,
+                count INTEGER NOT NULL
+            )
+            """)
+            cur.executemany("INSERT INTO temp.loaded_days (counter_id, day_ordinal, count) VALUES (?, ?, ?)", days)
+            loaded = cur.rowcount
+            cur.execute("""
+            INSERT INTO tracker_compacted (counter_id, day_ordinal, count)
+            SELECT counter_id, day_ordinal, SUM(count) FROM temp.loaded_days
+            GROUP BY counter_id, day_ordinal
+            ON CONFLICT (counter_id, day_ordinal) DO UPDATE SET count = count + excluded.count
+            """)
+            day_start = f"((k.day_ordinal - {_EPOCH_DAY}) * 86400)"
+            cur.execute(f"""
+            INSERT INTO tracker_period_rollup (counter_id, period_ordinal, count)
+            SELECT k.counter_id, {period_ordinal_sql(day_start, "c.period_type")} AS ordinal, SUM(k.count)
+            FROM temp.loaded_days k JOIN counter c ON c.id = k.counter_id
+            WHERE true
+            GROUP BY k.counter_id, ordinal
+            ON CONFLICT (counter_id, period_ordinal) DO UPDATE SET count = count + excluded.count
+            """)
+            touched = [row[0] for row in cur.execute("SELECT DISTINCT counter_id FROM temp.loaded_days")]
+            cur.executemany("DELETE FROM streak_cache WHERE counter_id = ?", ((_id,) for _id in touched))
+            cur.execute("DELETE FROM temp.loaded_days")
+    except Exception:
+        _rollback(db)
+        raise
+    _commit(db)
+    for counter_id in touched:
+        _notify(db, counter_id)
+    return loaded
+
+def compact_events(db, before: int) -> tuple:
+    """
+    Rolls the events older than `before` (epoch seconds) into per-day counts in
+    tracker_compacted and removes them from tracker, for compaction.py. They
+    stay counted in tracker_period_rollup: the per-row triggers of tracker are
+    suspended for the delete like in load_events, so a large delete costs one
+    pass instead of a rollup update per row, and the streak_cache rows of the
+    habits are dropped with one statement. All or nothing, like load_events.
+    :return: tuple: (events removed, day counts written)
+    """
+    cur = db.cursor()
+    try:
+        with _savepoint(db, "compact_events"):
+            cur.execute(f"""
+            INSERT INTO tracker_compacted (counter_id, day_ordinal, count)
+            SELECT counter_id, {day_ordinal_sql("timestamp")} AS day, COUNT(*) FROM tracker
+            WHERE timestamp < ?
+            GROUP BY counter_id, day
+            ON CONFLICT (counter_id, day_ordinal) DO UPDATE SET count = count + excluded.count
+            """, (before,))
+            days = cur.rowcount
+            touched = [row[0] for row in cur.execute(
+                "SELECT DISTINCT counter_id FROM tracker WHERE timestamp < ?", (before,))]
+            for trigger in _TRACKER_TRIGGERS:
+                cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            try:
+                cur.execute("DELETE FROM tracker WHERE timestamp < ?", (before,))
+                removed = cur.rowcount
+                cur.executemany("DELETE FROM streak_cache WHERE counter_id = ?", ((_id,) for _id in touched))
+            finally:
+                _create_rollup_triggers(cur, period_ordinal_sql)
+                _create_streak_cache_triggers(cur)
+    except Exception:
+        _rollback(db)
+        raise
+    _commit(db)
+    for counter_id in touched:
+        _notify(db, counter_id)
+    return removed, days
+
+def get_counter_ids(db, tenant: str = "") -> dict:
+    """
+    Fetches the IDs of all the habits of the tenant (from the metadata cache).
+    :return: dict: habit name to ID
+    """
+    return {name: habit.id for name, habit in get_habit_metadata(db, tenant).items()}
 
 def get_counter_data(db, counter_id : int):
     """
     Fetches the events of the habit with the given ID.
+    :return: list: (counter_id, timestamp) rows, timestamps in epoch seconds (see from_epoch)
     """
     cur = db.cursor()
     cur.execute("SELECT counter_id, timestamp FROM tracker WHERE counter_id = ?", (counter_id,))
     return cur.fetchall()
 
+def count_counter_events(db, counter_id: int, since: datetime = None, until: datetime = None) -> int:
+    """
+    Counts the events of the habit with the given ID inside SQLite,
+    optionally limited to the time range [since, until).
+    Without a range the per-period rollup is summed instead of the raw events.
+    """
+    cur = db.cursor()
+    if since is None and until is None:
+        cur.execute("SELECT COALESCE(SUM(count), 0) FROM tracker_period_rollup WHERE counter_id = ?", (counter_id,))
+        return cur.fetchone()[0]
+    where, params = range_clause(since, until)
+    days, day_params = compacted_day_clause(since, until)
+    cur.execute(f"""
+    SELECT (SELECT COUNT(*) FROM tracker WHERE counter_id = ?{where})
+         + (SELECT COALESCE(SUM(count), 0) FROM tracker_compacted WHERE counter_id = ?{days})
+    """, [counter_id, *params, counter_id, *day_params])
+    return cur.fetchone()[0]
+
+def count_all_events(db, since: datetime = None, until: datetime = None) -> dict:
+    """
+    Counts the events of every habit in one query,
+    optionally limited to the time range [since, until).
+    Habits without events are not part of the result.
+    :return: dict: counter ID to number of events
+    """
+    cur = db.cursor()
+    if since is None and until is None:
+        cur.execute("SELECT counter_id, SUM(count) FROM tracker_period_rollup GROUP BY counter_id")
+        return dict(cur.fetchall())
+    where, params = range_clause(since, until)
+    days, day_params = compacted_day_clause(since, until)
+    cur.execute(f"""
+    SELECT counter_id, SUM(events) FROM (
+        SELECT counter_id, COUNT(*) AS events FROM tracker WHERE 1 = 1{where} GROUP BY counter_id
+        UNION ALL
+        SELECT counter_id, SUM(count) FROM tracker_compacted WHERE 1 = 1{days} GROUP BY counter_id
+    ) GROUP BY counter_id
+    """, [*params, *day_params])
+    return dict(cur.fetchall())
+
+# rows fetched at once by the iter_* generators
+BATCH_SIZE = 4096
+
+def _iter_rows(cur, batch_size):
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def iter_counter_data(db, counter_id: int, since: datetime = None, until: datetime = None,
+                      batch_size: int = BATCH_SIZE, descending: bool = False):
+    """
+    Generator over the events of the habit with the given ID in timestamp order,
+    optionally limited to the time range [since, until).
+    The rows are read `batch_size` at a time through the (counter_id, timestamp) index,
+    so memory stays bounded and a caller that stops early never reads the rest.
+    :return: generator of (counter_id, timestamp) rows, timestamps in epoch seconds
+    """
+    where, params = range_clause(since, until)
+    order = "DESC" if descending else "ASC"
+    cur = db.cursor()
+    cur.execute(
+        f"SELECT counter_id, timestamp FROM tracker WHERE counter_id = ?{where} ORDER BY timestamp {order}",
+        [counter_id, *params]
+    )
+    yield from _iter_rows(cur, batch_size)
+
+def iter_compacted_days(db, counter_id: int = None, since: datetime = None, until: datetime = None,
+                        batch_size: int = BATCH_SIZE):
+    """
+    Generator over the per-day counts of the compacted events of one habit or of
+    all habits, optionally only the days completely inside [since, until).
+    :return: generator of (counter_id, day_ordinal, count) rows ordered by habit and day
+    """
+    days, params = compacted_day_clause(since, until)
+    cur = db.cursor()
+    cur.execute(f"""
+    SELECT counter_id, day_ordinal, count FROM tracker_compacted
+    WHERE counter_id = COALESCE(?, counter_id){days}
+    ORDER BY counter_id, day_ordinal
+    """, [counter_id, *params])
+    yield from _iter_rows(cur, batch_size)
+
+def iter_period_counts(db, counter_id: int, required: int = 1, batch_size: int = BATCH_SIZE,
+                       since_ordinal: int = None, until_ordinal: int = None):
+    """
+    Generator over the periods of the habit with the given ID that have
+    at least `required` events, in ascending order, read `batch_size` rows at a time,
+    optionally limited to the period ordinals [since_ordinal, until_ordinal).
+    :return: generator of (period_ordinal, count) rows
+    """
+    sql = ("SELECT period_ordinal, count FROM tracker_period_rollup "
+           "WHERE counter_id = ? AND count >= ?")
+    params = [counter_id, required]
+    if since_ordinal is not None:
+        sql += " AND period_ordinal >= ?"
+        params.append(since_ordinal)
+    if until_ordinal is not None:
+        sql += " AND period_ordinal < ?"
+        params.append(until_ordinal)
+    cur = db.cursor()
+    cur.execute(sql + " ORDER BY period_ordinal", params)
+    yield from _iter_rows(cur, batch_size)
+
+def get_period_counts(db, counter_id: int, required: int = 1):
+    """
+    Fetches the periods of the habit with the given ID that have
+    at least `required` events, in ascending order.
+    :return: list: (period_ordinal, count) rows
+    """
+    return list(iter_period_counts(db, counter_id, required))
+
+def iter_period_counts_desc(db, counter_id: int):
+    """
+    Iterates over the (period_ordinal, count) rows of the habit with the
+    given ID, newest period first, reading lazily from the rollup table.
+    """
+    cur = db.cursor()
+    cur.execute(
+        "SELECT period_ordinal, count FROM tracker_period_rollup "
+        "WHERE counter_id = ? ORDER BY period_ordinal DESC",
+        (counter_id,)
+    )
+    return cur
+
+def get_period_count_at(db, counter_id: int, ordinal: int) -> int:
+    """
+    Fetches the number of events of the habit with the given ID in one period.
+    """
+    cur = db.cursor()
+    cur.execute(
+        "SELECT count FROM tracker_period_rollup WHERE counter_id = ? AND period_ordinal = ?",
+        (counter_id, ordinal)
+    )
+    row = cur.fetchone()
+    return row[0] if row is not None else 0
+
+def get_streak_cache(db, counter_id: int):
+    """
+    Fetches the persisted streak state of the habit with the given ID.
+    :return: tuple: (last_event_id, longest, run, last_good) or None if nothing is cached
+    """
+    cur = db.cursor()
+    cur.execute(
+        "SELECT last_event_id, longest, run, last_good FROM streak_cache WHERE counter_id = ?",
+        (counter_id,)
+    )
+    return cur.fetchone()
+
+def save_streak_cache(db, counter_id: int, last_event_id, longest: int, run: int, last_good):
+    """
+    Persists the streak state of the habit with the given ID and makes commit to the database.
+    """
+    db.execute(
+        "INSERT OR REPLACE INTO streak_cache (counter_id, last_event_id, longest, run, last_good) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (counter_id, last_event_id, longest, run, last_good)
+    )
+    _commit(db)
+
+def get_last_event_id(db, counter_id: int):
+    """
+    Fetches the ID of the newest event row of the habit with the given ID.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT MAX(id) FROM tracker WHERE counter_id = ?", (counter_id,))
+    return cur.fetchone()[0]
+
+def iter_all_period_counts(db, first_id: int = None, last_id: int = None, tenant: str = ""):
+    """
+    Iterates over the rollup of every habit of the tenant, ordered by habit and period,
+    optionally only for the habits with IDs from first_id to last_id (inclusive).
+    Habits without events yield one row with NULL period and count.
+    :return: cursor: (id, name, period_type, period_count, period_ordinal, count) rows
+    """
+    cur = db.cursor()
+    cur.execute("""
+    SELECT c.id, c.name, c.period_type, c.period_count, r.period_ordinal, r.count
+    FROM counter c LEFT JOIN tracker_period_rollup r ON r.counter_id = c.id
+    WHERE c.tenant = ? AND c.id BETWEEN COALESCE(?, c.id) AND COALESCE(?, c.id)
+    ORDER BY c.id, r.period_ordinal
+    """, (tenant, first_id, last_id))
+    return cur
+
+def get_counter_id_range(db, tenant: str = ""):
+    """
+    Fetches the smallest and the largest ID of the habits of the tenant.
+    :return: tuple: (min ID, max ID), both None if there are no habits
+    """
+    cur = db.cursor()
+    cur.execute("SELECT MIN(id), MAX(id) FROM counter WHERE tenant = ?", (tenant,))
+    return cur.fetchone()
+
 def delete_counter(db, _id: int):
     """
     Remove the habit itself from `counter`.
     """
     cursor = db.cursor()
     cursor.execute("DELETE FROM counter WHERE id = ?", (_id,))
-    db.commit()
+    _commit(db)
+    invalidate_metadata(db)
+    _notify(db, _id)
@@ -0,0 +1,269 @@
+import functools
+import inspect
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import analyse
+import db as database
+
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# literals of the expanded SQL the trace callback receives, replaced by ?
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def normalize_sql(sql: str) -> str:
+    """
+    Turns an executed statement into its template: literals become ? and the
+    whitespace is collapsed, so the executions of one query are counted together.
+    """
+    return " ".join(_LITERALS.sub("?", sql).split())
+
+class Histogram:
+    """
+    Cumulative latency histogram with the fixed BUCKETS, as Prometheus has them.
+    """
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list:
+        """
+        :return: list: (upper bound, observations up to it) pairs, ending with +Inf
+        """
+        result = []
+        total = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            total += count
+            result.append((bound, total))
+        result.append((float("inf"), self.count))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_seconds": self.sum,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                        for bound, count in self.cumulative()},
+        }
+
+class Instrumentation:
+    """
+    Latency histograms of function calls and counts and timings of the SQL
+    statements run on the attached connections.
+
+    SQLite reports every statement to the trace callback when it starts,
+    statements run by triggers included (they show up as repeats of the
+    statement that fired them). A statement is timed until the next one
+    starts or the instrumented call around it returns, so the time includes
+    fetching its rows.
+    """
+
+    def __init__(self):
+        self.functions = {}   # qualified function name -> Histogram
+        self.statements = {}  # normalized SQL -> [executions, seconds]
+        self._lock = threading.Lock()
+        self._open = threading.local()  # statement of the thread still being timed
+
+    # ——— functions ———
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.functions.get(name)
+            if histogram is None:
+                histogram = self.functions[name] = Histogram()
+            histogram.observe(seconds)
+
+    def wrap(self, fn, name: str = None):
+        """
+        :return: fn with its calls recorded under `name` (module.function by default)
+        """
+        name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self._close_statement(end)
+                self.observe(name, end - start)
+        return timed
+
+    @contextmanager
+    def measure(self, name: str):
+        """
+        Records the time spent in the with block under `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._close_statement(end)
+            self.observe(name, end - start)
+
+    # ——— SQL ———
+
+    def attach(self, db):
+        """
+        Starts recording the statements of the connection (replaces its trace callback).
+        """
+        db.set_trace_callback(self._on_statement)
+
+    def detach(self, db):
+        self._close_statement(time.perf_counter())
+        db.set_trace_callback(None)
+
+    def _on_statement(self, sql: str):
+        now = time.perf_counter()
+        self._close_statement(now)
+        self._open.statement = (normalize_sql(sql), now)
+
+    def _close_statement(self, now: float):
+        statement = getattr(self._open, "statement", None)
+        if statement is None:
+            return
+        self._open.statement = None
+        sql, start = statement
+        with self._lock:
+            entry = self.statements.get(sql)
+            if entry is None:
+                entry = self.statements[sql] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += now - start
+
+    @property
+    def statement_count(self) -> int:
+        """
+        The number of statements executed so far.
+        """
+        with self._lock:
+            return sum(count for count, _ in self.statements.values())
+
+    # ——— export ———
+
+    def reset(self):
+        with self._lock:
+            self.functions.clear()
+            self.statements.clear()
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict: the recorded data, ready for json.dump
+        """
+        with self._lock:
+            return {
+                "functions": {name: h.to_dict() for name, h in sorted(self.functions.items())},
+                "statements": [
+                    {"sql": sql, "count": count, "seconds": seconds}
+                    for sql, (count, seconds) in sorted(self.statements.items(), key=lambda item: -item[1][1])
+                ],
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "habits") -> str:
+        """
+        :return: str: the recorded data in the Prometheus text exposition format
+        """
+        lines = [
+            f"# HELP {prefix}_function_duration_seconds Latency of the instrumented functions.",
+            f"# TYPE {prefix}_function_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.functions.items()):
+                label = f'function="{_escape(name)}"'
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{prefix}_function_duration_seconds_bucket{{{label},le="{le}"}} {count}')
+                lines.append(f"{prefix}_function_duration_seconds_sum{{{label}}} {histogram.sum!r}")
+                lines.append(f"{prefix}_function_duration_seconds_count{{{label}}} {histogram.count}")
+
+            lines += [
+                f"# HELP {prefix}_sql_statements_total Executed SQL statements.",
+                f"# TYPE {prefix}_sql_statements_total counter",
+            ]
+            lines += [f'{prefix}_sql_statements_total{{statement="{_escape(sql)}"}} {count}'
+                      for sql, (count, _) in sorted(self.statements.items())]
+            lines += [
+                f"# HELP {prefix}_sql_statement_seconds_total Time spent in the SQL statements.",
+                f"# TYPE {prefix}_sql_statement_seconds_total counter",
+            ]
+            lines += [f'{prefix}_sql_statement_seconds_total{{statement="{_escape(sql)}"}} {seconds!r}'
+                      for sql, (_, seconds) in sorted(self.statements.items())]
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# The process-wide instrumentation while enabled, None otherwise
+instrumentation = None
+# (module, name, original function) of the replaced functions
+_patched = []
+
+def enable(modules=(database, analyse)) -> Instrumentation:
+    """
+    Turns on the instrumentation: the public functions of the modules are
+    replaced by timed wrappers (generator functions excluded, their work happens
+    after they return). Calls through the module attributes, like
+    database.find_habit in analyse, are recorded as well; names imported with
+    `from db import ...` keep the original function.
+    Connections still have to be attached to record their SQL.
+    :return: Instrumentation: the new instrumentation
+    """
+    global instrumentation
+    disable()
+    instrumentation = Instrumentation()
+    for module in modules:
+        for name, fn in vars(module).items():
+            if (not name.startswith("_") and inspect.isfunction(fn) and fn.__module__ == module.__name__
+                    and not inspect.isgeneratorfunction(inspect.unwrap(fn))):
+                _patched.append((module, name, fn))
+    for module, name, fn in _patched:
+        setattr(module, name, instrumentation.wrap(fn))
+    return instrumentation
+
+def disable():
+    """
+    Restores the original functions of the instrumented modules.
+    """
+    global instrumentation
+    for module, name, fn in _patched:
+        setattr(module, name, fn)
+    _patched.clear()
+    instrumentation = None
+
+@contextmanager
+def profile(db):
+    """
+    Records the statements of the connection and the function calls in the
+    with block with a fresh instrumentation, then turns it off again.
+
+        with instrument.profile(db) as stats:
+            analyse.streak_analyse(db, "Water")
+        print(stats.statement_count)
+    """
+    stats = enable()
+    stats.attach(db)
+    try:
+        yield stats
+    finally:
+        stats.detach(db)
+        disable()
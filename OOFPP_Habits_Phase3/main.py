@@ -1,12 +1,13 @@
-
-import questionary
+import argparse
+import json
+import sys
 import db as database
 from counter import Counter, add_event, delete_event
 import analyse
 from datetime import datetime
 from db import UnitNames
 
-def cli():
+def cli(db_name="main.db"):
     """Launch the interactive command-line interface for the habit tracker.
 
     Presents a menu of actions—Create, Delete, Complete the Task, Analyse, and Exit—
@@ -19,8 +20,11 @@ def cli():
 
     This function will block until the user selects “Exit.”
     """
+    # imported here, so the non-interactive commands don't pay for prompt-toolkit
+    import questionary
 
-    db = database.get_db()
+    db = database.get_db(db_name)
+    analyse.enable_streak_cache(persistent=True)
 
     #Actions with habits
     while True:
@@ -141,7 +145,7 @@ def cli():
                 add_event(name, db, completed_at)
             except Exception as e:
                 print(f" Could not record completion for '{name}': {e}\n")
-            print(f"➕ Completed '{name}' on {completed_at.strftime("%Y-%m-%d %H:%M:%S")}.\n")
+            print(f"➕ Completed '{name}' on {completed_at.strftime('%Y-%m-%d %H:%M:%S')}.\n")
 
         elif choice == "Analyse":
             # ask which kind of analysis
@@ -204,7 +208,7 @@ def cli():
                     ).ask()
                     if not name: continue
 
-                    length, period_type = analyse.streak_analyse(db, name)
+                    length, period_type = analyse.current_streak(db, name)
 
                     unit = period_type.label
                     unit_label = unit if length == 1 else unit + "s"
@@ -215,19 +219,11 @@ def cli():
                     )
 
                 if which == "longest":
-                    max_length = 0
-                    best_habit = None
-                    best_unit = "period"
-
-                    # for each habit, compute its longest streak
-                    for name in habit_names:
-                        length, period_type = analyse.streak_analyse(db, name)
-
-                        # track the overall best
-                        if length > max_length:
-                            max_length = length
-                            best_habit = name
-                            best_unit = period_type.label
+                    # all_streaks is ranked, the first entry holds the overall best
+                    best = analyse.all_streaks(db)[0]
+                    max_length = best.longest
+                    best_habit = best.name
+                    best_unit = best.period_type.label
 
                     if max_length == 0:
                         print("➤ You haven't met the requirement for any streak yet.\n")
@@ -239,5 +235,162 @@ def cli():
                         )
 
 
+def parse_timestamp(value: str) -> datetime:
+    """
+    argparse type for the timestamps of the commands, YYYY-MM-DD[ HH:MM[:SS]].
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a valid timestamp. Please use YYYY-MM-DD HH:MM:SS.")
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Command line of the non-interactive commands. Without a command the interactive menu is started.
+    """
+    parser = argparse.ArgumentParser(description="Habit tracker. Run without a command for the interactive menu.")
+    parser.add_argument("--db", default="main.db", help="path of the database file (default: main.db)")
+    parser.add_argument("--profile", choices=["json", "prometheus"],
+                        help="print function timings and SQL statement counts to stderr")
+    commands = parser.add_subparsers(dest="command")
+
+    add = commands.add_parser("add", help="create a habit")
+    add.add_argument("name")
+    add.add_argument("--description", default="")
+    add.add_argument("--period", choices=[unit.label for unit in UnitNames], default=UnitNames.PERIOD_DAILY.label)
+    add.add_argument("--count", type=int, default=1, help="times per period")
+
+    done = commands.add_parser("done", help="check off one or more habits")
+    done.add_argument("names", nargs="+", metavar="NAME")
+    done.add_argument("--at", type=parse_timestamp, help="completion time, now by default")
+
+    delete = commands.add_parser("delete", help="delete a habit and its history")
+    delete.add_argument("name")
+
+    commands.add_parser("list", help="list all habits")
+
+    count = commands.add_parser("count", help="count the check-ins of a habit")
+    count.add_argument("name")
+    count.add_argument("--since", type=parse_timestamp)
+    count.add_argument("--until", type=parse_timestamp)
+
+    streak = commands.add_parser("streak", help="longest and current streaks")
+    which = streak.add_mutually_exclusive_group(required=True)
+    which.add_argument("name", nargs="?")
+    which.add_argument("--all", action="store_true", help="all habits, best first")
+    streak.add_argument("--json", action="store_true", help="print JSON")
+
+    compact = commands.add_parser("compact", help="roll old check-ins into day counts")
+    compact.add_argument("--keep-days", type=int, default=365, help="days of raw check-ins to keep (default: 365)")
+    compact.add_argument("--archive", help="SQLite file receiving the compacted check-ins")
+
+    formats = ["jsonl", "npz", "arrow"]
+    export = commands.add_parser("export", help="write all habits and check-ins to a file")
+    export.add_argument("path", help="output file, the format follows from .jsonl, .npz or .arrow")
+    export.add_argument("--format", choices=formats)
+    load = commands.add_parser("import", help="read habits and check-ins from an exported file")
+    load.add_argument("path")
+    load.add_argument("--format", choices=formats)
+    return parser
+
+def run_command(args, stats=None) -> int:
+    """
+    Executes one non-interactive command.
+    :param stats: instrument.Instrumentation recording the SQL of the command, optional
+    :return: int: the exit status
+    """
+    db = database.get_db(args.db)
+    if stats is not None:
+        stats.attach(db)
+    try:
+        if args.command == "add":
+            if database.find_counter_by_name(db, args.name) is not None:
+                print(f"Habit '{args.name}' already exists, please choose a different name.", file=sys.stderr)
+                return 1
+            period_type = next(unit for unit in UnitNames if unit.label == args.period)
+            counter = Counter(args.name, args.description, period_type, args.count)
+            database.add_counter(db, counter.name, counter.description, counter.period_type, counter.period_count)
+            unit = {UnitNames.PERIOD_DAILY: "day", UnitNames.PERIOD_WEEKLY: "week"}.get(period_type, "month")
+            print(f"Habit '{args.name}' created: {args.count}× per {unit}.")
+
+        elif args.command == "done":
+            completed_at = args.at or datetime.now()
+            with database.transaction(db):
+                for name in args.names:
+                    add_event(name, db, completed_at)
+            for name in args.names:
+                print(f"Completed '{name}' on {completed_at.strftime('%Y-%m-%d %H:%M:%S')}.")
+
+        elif args.command == "delete":
+            if database.find_counter_by_name(db, args.name) is None:
+                raise ValueError(f"No such habit: {args.name!r}")
+            delete_event(db, args.name)
+            print(f"Habit '{args.name}' and its history have been deleted.")
+
+        elif args.command == "list":
+            for name in database.get_habit_names(db):
+                print(name)
+
+        elif args.command == "count":
+            if database.find_counter_by_name(db, args.name) is None:
+                raise ValueError(f"No such habit: {args.name!r}")
+            print(analyse.count_events(db, args.name, args.since, args.until))
+
+        elif args.command == "streak":
+            if args.all:
+                streaks = analyse.all_streaks(db)
+            else:
+                longest, period_type = analyse.streak_analyse(db, args.name)
+                current, _ = analyse.current_streak(db, args.name)
+                streaks = [analyse.HabitStreak(args.name, longest, current, period_type)]
+            if args.json:
+                print(json.dumps([
+                    {"name": s.name, "longest": s.longest, "current": s.current, "period": s.period_type.label}
+                    for s in streaks
+                ]))
+            else:
+                for s in streaks:
+                    print(f"{s.name}: longest {s.longest}, current {s.current} ({s.period_type.label})")
+
+        elif args.command == "compact":
+            import compaction
+            result = compaction.compact(db, compaction.retention_horizon(args.keep_days), args.archive)
+            print(f"Compacted {result.rows_compacted} check-ins before {result.horizon:%Y-%m-%d} "
+                  f"into {result.days_compacted} day counts, {result.bytes_reclaimed} bytes reclaimed.")
+
+        elif args.command in ("export", "import"):
+            import transfer
+            if args.command == "export":
+                result = transfer.export_database(db, args.path, args.format)
+            else:
+                result = transfer.import_database(db, args.path, args.format)
+            print(f"{args.command.capitalize()}ed {result.habits} habits, {result.events} check-ins "
+                  f"and {result.days} compacted days.")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        cli(args.db)
+        return 0
+    if not args.profile:
+        return run_command(args)
+
+    import instrument  # only needed for --profile
+    stats = instrument.enable()
+    try:
+        with stats.measure(f"main.{args.command}"):
+            status = run_command(args, stats)
+    finally:
+        instrument.disable()
+    print(stats.to_json(indent=2) if args.profile == "json" else stats.to_prometheus(), file=sys.stderr)
+    return status
+
+
 if __name__ == "__main__":
-    cli()
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import analyse
+import db as database
+
+def _streaks_in_range(path: str, first_id: int, last_id: int, now: datetime, tenant: str = "") -> list:
+    """
+    Worker: streaks of the tenant's habits with IDs first_id..last_id, read through
+    the worker's own read-only connection.
+    """
+    db = database.connect(path, read_only=True)
+    try:
+        return analyse.streaks_from_rows(database.iter_all_period_counts(db, first_id, last_id, tenant), now)
+    finally:
+        db.close()
+
+def id_ranges(first_id: int, last_id: int, parts: int) -> list:
+    """
+    Splits the IDs first_id..last_id into at most `parts` contiguous inclusive ranges.
+    """
+    size = max(-(-(last_id - first_id + 1) // parts), 1)
+    return [(start, min(start + size - 1, last_id)) for start in range(first_id, last_id + 1, size)]
+
+def parallel_all_streaks(path: str, workers: int = None, now: datetime = None, chunks_per_worker: int = 4,
+                         tenant: str = "") -> list:
+    """
+    analyse.all_streaks computed by a pool of processes.
+
+    The habits are partitioned into ranges of their IDs, every range is analysed
+    by a worker process with its own read-only connection to the database file
+    and the partial results are merged into one ranking.
+    :param path: path of the database file (an in-memory database can't be shared)
+    :param workers: int: number of processes, os.cpu_count() by default
+    :param chunks_per_worker: int: ranges per process, more ranges even out skewed habits
+    :param tenant: the user owning the habits, '' for the single-user database
+    :return: list: HabitStreak entries ranked like analyse.all_streaks
+    """
+    workers = workers or os.cpu_count() or 1
+    now = now or datetime.now()
+    db = database.connect(path, read_only=True)
+    try:
+        first_id, last_id = database.get_counter_id_range(db, tenant)
+    finally:
+        db.close()
+    if first_id is None:
+        return []
+
+    ranges = id_ranges(first_id, last_id, workers * chunks_per_worker)
+    result = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_streaks_in_range, path, lo, hi, now, tenant) for lo, hi in ranges]
+        for future in futures:
+            result.extend(future.result())
+    return analyse.rank_streaks(result)
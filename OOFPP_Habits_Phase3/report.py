@@ -0,0 +1,119 @@
+from collections import namedtuple
+from datetime import datetime
+
+import analyse
+import db as database
+
+# one entry of completion_report
+HabitReport = namedtuple("HabitReport", [
+    "name", "period_type", "period_count", "events",
+    "periods_elapsed", "periods_met", "completion_rate", "success_ratio",
+])
+
+def completion_report(db, now: datetime = None, tenant: str = "") -> list:
+    """
+    Completion statistics of every habit of the tenant, aggregated by SQLite
+    from the per-period rollup in a single query.
+
+    For the periods from the first recorded one up to the current one:
+    - completion_rate: share of the periods in which the requirement was met
+    - success_ratio: share of the required check-ins that were done,
+      counting at most period_count check-ins per period
+
+    Both are 0.0 for habits without events.
+    :return: list: HabitReport entries in the order of the habit IDs
+    """
+    return [report for _, report in _completion_rows(db, now or datetime.now(), tenant)]
+
+def completion_reports(db, now: datetime = None) -> dict:
+    """
+    completion_report of every tenant of the database, in a single query.
+    :return: dict: tenant to its list of HabitReport entries
+    """
+    result = {}
+    for tenant, report in _completion_rows(db, now or datetime.now()):
+        result.setdefault(tenant, []).append(report)
+    return result
+
+def _completion_rows(db, now: datetime, tenant: str = None):
+    """
+    :param tenant: only the habits of this tenant, None for all
+    :return: generator of (tenant, HabitReport) pairs in the order of the habit IDs
+    """
+    cur = db.cursor()
+    cur.execute("""
+    SELECT c.tenant, c.name, c.period_type, c.period_count,
+           COALESCE(SUM(r.count), 0),
+           MIN(r.period_ordinal),
+           COALESCE(SUM(r.count >= c.period_count), 0),
+           COALESCE(SUM(MIN(r.count, c.period_count)), 0)
+    FROM counter c LEFT JOIN tracker_period_rollup r ON r.counter_id = c.id
+    WHERE c.tenant = COALESCE(?, c.tenant)
+    GROUP BY c.id
+    ORDER BY c.id
+    """, (tenant,))
+    for tenant, name, period_type, period_count, events, first, met, done in cur.fetchall():
+        period_type = database.UnitNames(period_type)
+        elapsed = 0
+        if first is not None:
+            elapsed = max(analyse.period_ordinal(now, period_type) - first + 1, 1)
+        yield tenant, HabitReport(
+            name, period_type, period_count, events, elapsed, met,
+            met / elapsed if elapsed else 0.0,
+            done / (elapsed * period_count) if elapsed else 0.0,
+        )
+
+def _histogram(db, bucket_sql: str, size: int, since: datetime = None, until: datetime = None,
+               tenant: str = "", day_bucket_sql: str = None) -> dict:
+    """
+    Counts the events of every habit of the tenant per bucket in one GROUP BY query.
+    :param bucket_sql: SQL expression of the bucket (0 .. size - 1) of the `timestamp` column
+    :param day_bucket_sql: SQL expression of the bucket of the `day_ordinal` column:
+        the per-day counts of tracker_compacted are added to that bucket;
+        None leaves the compacted days out
+    :return: dict: habit name to a list of `size` counts
+    """
+    where, params = database.range_clause(since, until)
+    compacted = ""
+    if day_bucket_sql is not None:
+        day_where, day_params = database.compacted_day_clause(since, until)
+        compacted = f"""
+        UNION ALL
+        SELECT counter_id, {day_bucket_sql} AS bucket, SUM(count) AS events
+        FROM tracker_compacted WHERE 1 = 1{day_where}
+        GROUP BY counter_id, bucket"""
+        params += day_params
+    cur = db.cursor()
+    cur.execute(f"""
+    SELECT c.name, b.bucket, SUM(b.events)
+    FROM counter c LEFT JOIN (
+        SELECT counter_id, {bucket_sql} AS bucket, COUNT(*) AS events
+        FROM tracker WHERE 1 = 1{where}
+        GROUP BY counter_id, bucket{compacted}
+    ) b ON b.counter_id = c.id
+    WHERE c.tenant = ?
+    GROUP BY c.id, b.bucket
+    """, [*params, tenant])
+    result = {}
+    for name, bucket, events in cur.fetchall():
+        counts = result.setdefault(name, [0] * size)
+        if bucket is not None:
+            counts[bucket] = events
+    return result
+
+def hour_histogram(db, since: datetime = None, until: datetime = None, tenant: str = "") -> dict:
+    """
+    Number of check-ins per hour of the day (0–23) of every habit.
+    The days rolled up by compaction.py are left out: their times of day are gone.
+    :return: dict: habit name to a list of 24 counts
+    """
+    return _histogram(db, "((timestamp % 86400 + 86400) % 86400) / 3600", 24, since, until, tenant)
+
+def weekday_histogram(db, since: datetime = None, until: datetime = None, tenant: str = "") -> dict:
+    """
+    Number of check-ins per day of the week (0 = Monday … 6 = Sunday) of every habit,
+    including the days rolled up by compaction.py that lie completely inside the range.
+    :return: dict: habit name to a list of 7 counts
+    """
+    return _histogram(db, f"({database.day_ordinal_sql('timestamp')} - 1) % 7", 7, since, until, tenant,
+                      "(day_ordinal - 1) % 7")
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import analyse
+import db as database
+import report
+from counter import add_event
+
+# size of one shard, see ShardRouter.shard_stats
+ShardStats = namedtuple("ShardStats", ["shard", "path", "tenants", "habits", "events", "bytes"])
+
+def tenant_hash(tenant: str) -> int:
+    """
+    Stable 64-bit hash of a tenant name, the same in every process
+    (unlike hash(), which is salted per process).
+    """
+    return int.from_bytes(hashlib.blake2b(tenant.encode("utf-8"), digest_size=8).digest(), "big")
+
+class ShardRouter:
+    """
+    Spreads the habits of many users (tenants) over several SQLite files.
+
+    Every tenant lives in exactly one shard, chosen by the hash of its name,
+    so writes of different users go to different files and no file holds all
+    the data. get_db(tenant) gives the connection of the tenant's shard; the
+    db, counter and analyse functions then take the tenant as a keyword
+    argument. The aggregates over all tenants visit the shards one by one.
+
+        with ShardRouter("data/", shards=16) as router:
+            router.add_habit("alice", "Water", "", UnitNames.PERIOD_DAILY, 4)
+            router.add_event("alice", "Water")
+            db = router.get_db("alice")
+            length, period_type = analyse.streak_analyse(db, "Water", tenant="alice")
+
+    The number of shards is stored in the directory: a different number would
+    move the tenants to other files, so it can't change once data is written.
+    The connections belong to the thread that opened the router.
+    """
+    MANIFEST = "shards.json"
+
+    def __init__(self, directory: str, shards: int = 16, **pragmas):
+        """
+        :param directory: folder of the shard files, created if missing
+        :param shards: int: the number of shard files
+        :param pragmas: connection settings, see db.connect
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as f:
+                stored = json.load(f)["shards"]
+            if stored != shards:
+                raise ValueError(f"{directory} is split into {stored} shards, not {shards}")
+        else:
+            with open(manifest, "w", encoding="utf-8") as f:
+                json.dump({"shards": shards}, f)
+        self.directory = directory
+        self.shards = shards
+        self._pragmas = pragmas
+        self._connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shard_of(self, tenant: str) -> int:
+        """
+        :return: int: the number of the shard holding the tenant
+        """
+        return tenant_hash(tenant) % self.shards
+
+    def path(self, shard: int) -> str:
+        return os.path.join(self.directory, f"shard-{shard:03d}.db")
+
+    def shard_db(self, shard: int):
+        """
+        The connection of one shard, opened (and migrated) on first use.
+        """
+        db = self._connections.get(shard)
+        if db is None:
+            db = self._connections[shard] = database.get_db(self.path(shard), **self._pragmas)
+        return db
+
+    def get_db(self, tenant: str):
+        """
+        The connection of the shard of the tenant, like db.get_db for a single database.
+        """
+        return self.shard_db(self.shard_of(tenant))
+
+    def close(self):
+        for db in self._connections.values():
+            db.close()
+        self._connections.clear()
+
+    # ——— writes of one tenant ———
+
+    def add_habit(self, tenant: str, name: str, description: str,
+                  period_type: database.UnitNames, period_count: int) -> int:
+        """
+        See db.add_counter.
+        :return: ID of the new habit within its shard
+        """
+        return database.add_counter(self.get_db(tenant), name, description, period_type, period_count, tenant)
+
+    def add_event(self, tenant: str, name: str, date: datetime = None):
+        """
+        Checks off a habit of the tenant, see counter.add_event.
+        """
+        add_event(name, self.get_db(tenant), date or datetime.now(), tenant)
+
+    # ——— aggregates over all shards ———
+
+    def _existing_shards(self):
+        """
+        The connections of the shards that have a file, empty shards are not created.
+        """
+        for shard in range(self.shards):
+            if shard in self._connections or os.path.exists(self.path(shard)):
+                yield shard, self.shard_db(shard)
+
+    def tenant_event_counts(self, since: datetime = None, until: datetime = None) -> dict:
+        """
+        Number of events of every tenant, optionally only inside [since, until),
+        with one GROUP BY query per shard.
+        :return: dict: tenant to the number of its events (0 for tenants without events)
+        """
+        result = {}
+        for _, db in self._existing_shards():
+            cur = db.cursor()
+            if since is None and until is None:
+                cur.execute("""
+                SELECT c.tenant, COALESCE(SUM(r.count), 0)
+                FROM counter c LEFT JOIN tracker_period_rollup r ON r.counter_id = c.id
+                GROUP BY c.tenant
+                """)
+            else:
+                # compacted days count when they lie completely inside the range, like db.count_all_events
+                where, params = database.range_clause(since, until)
+                days, day_params = database.compacted_day_clause(since, until)
+                cur.execute(f"""
+                SELECT c.tenant, COALESCE(SUM(e.events), 0)
+                FROM counter c LEFT JOIN (
+                    SELECT counter_id, COUNT(*) AS events FROM tracker WHERE 1 = 1{where}
+                    GROUP BY counter_id
+                    UNION ALL
+                    SELECT counter_id, SUM(count) FROM tracker_compacted WHERE 1 = 1{days}
+                    GROUP BY counter_id
+                ) e ON e.counter_id = c.id
+                GROUP BY c.tenant
+                """, [*params, *day_params])
+            result.update(cur.fetchall())
+        return result
+
+    def completion_reports(self, now: datetime = None) -> dict:
+        """
+        report.completion_report of every tenant of all the shards.
+        :return: dict: tenant to its list of HabitReport entries
+        """
+        now = now or datetime.now()
+        result = {}
+        for _, db in self._existing_shards():
+            result.update(report.completion_reports(db, now))
+        return result
+
+    def all_streaks(self, tenant: str, now: datetime = None) -> list:
+        """
+        analyse.all_streaks of one tenant.
+        """
+        return analyse.all_streaks(self.get_db(tenant), now, tenant)
+
+    def shard_stats(self) -> list:
+        """
+        How the tenants, habits and events are spread over the shards.
+        :return: list: ShardStats of the shards that have a file
+        """
+        result = []
+        for shard, db in self._existing_shards():
+            tenants, habits = db.execute("SELECT COUNT(DISTINCT tenant), COUNT(*) FROM counter").fetchone()
+            events = db.execute("SELECT COALESCE(SUM(count), 0) FROM tracker_period_rollup").fetchone()[0]
+            size = db.execute("PRAGMA page_count").fetchone()[0] * db.execute("PRAGMA page_size").fetchone()[0]
+            result.append(ShardStats(shard, self.path(shard), tenants, habits, events, size))
+        return result
@@ -0,0 +1,180 @@
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import groupby, repeat
+from operator import itemgetter
+
+import analyse
+import db as database
+from counter import Counter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the arrays are then processed in pure Python
+    np = None
+
+class EventStore:
+    """
+    Column-oriented in-memory copy of the habits and their events for analytics.
+
+    The events of every habit are kept as one sorted array('q') of epoch
+    seconds (8 bytes per event; `timestamps` gives a NumPy int64 view of the
+    same buffer), its metadata as a slot-based counter.Counter. The analyses of
+    analyse.py are available as methods with the same names, without the
+    database argument.
+    """
+    __slots__ = ("habits", "_events")
+
+    def __init__(self):
+        self.habits = {}   # habit name -> Counter
+        self._events = {}  # habit ID -> sorted array('q') of epoch seconds
+
+    @classmethod
+    def load(cls, db, batch_size: int = 65536, tenant: str = "") -> "EventStore":
+        """
+        Reads all the habits of the tenant and their events from the database.
+        The events are fetched in batches, so no list of all rows is built.
+        Events removed by compaction.py come back as check-ins at the start of
+        their day, which keeps the counts by day and the streaks unchanged.
+        """
+        store = cls()
+        cur = db.cursor()
+        cur.execute("SELECT id, name, description, period_type, period_count FROM counter WHERE tenant = ?",
+                    (tenant,))
+        for _id, name, description, period_type, period_count in cur.fetchall():
+            store.habits[name] = Counter(name, description, period_type, period_count, _id)
+            store._events[_id] = array("q")
+
+        cur.execute("SELECT counter_id, timestamp FROM tracker ORDER BY counter_id, timestamp")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for counter_id, group in groupby(rows, key=itemgetter(0)):
+                events = store._events.get(counter_id)
+                if events is not None:  # habits of other tenants are skipped
+                    events.extend(ts for _, ts in group)
+
+        compacted = {}
+        for counter_id, day, count in database.iter_compacted_days(db, batch_size=batch_size):
+            if counter_id in store._events:
+                compacted.setdefault(counter_id, array("q")).extend(
+                    repeat((day - analyse.EPOCH_DAY) * 86400, count))
+        for counter_id, events in compacted.items():
+            events.extend(store._events[counter_id])
+            store._events[counter_id] = array("q", sorted(events))
+
+        for habit in store.habits.values():
+            habit.count = len(store._events[habit.id])
+        return store
+
+    def _habit(self, name: str) -> Counter:
+        habit = self.habits.get(name)
+        if habit is None:
+            raise ValueError(f"No habit named '{name}'")
+        return habit
+
+    def add_event(self, name: str, event_time: datetime = None):
+        """
+        Adds an event to the in-memory copy only, the database is not changed.
+        """
+        habit = self._habit(name)
+        insort(self._events[habit.id], database.to_epoch(event_time or datetime.now()))
+        habit.count += 1
+
+    def timestamps(self, name: str):
+        """
+        The sorted event timestamps (epoch seconds) of the habit,
+        as a NumPy int64 array sharing the memory if NumPy is installed.
+        """
+        events = self._events[self._habit(name).id]
+        if np is not None:
+            return np.frombuffer(events, dtype=np.int64) if len(events) else np.empty(0, dtype=np.int64)
+        return events
+
+    def nbytes(self) -> int:
+        """
+        Memory used by the event columns.
+        """
+        return sum(events.itemsize * len(events) for events in self._events.values())
+
+    def count_events(self, name: str, since: datetime = None, until: datetime = None) -> int:
+        """
+        Counts the events of the habit, optionally only inside the time range [since, until).
+        """
+        events = self._events[self._habit(name).id]
+        start = bisect_left(events, database.to_epoch(since)) if since is not None else 0
+        end = bisect_left(events, database.to_epoch(until)) if until is not None else len(events)
+        return max(end - start, 0)
+
+    def count_all_events(self, since: datetime = None, until: datetime = None) -> dict:
+        """
+        :return: dict: habit name to the number of its events
+        """
+        return {name: self.count_events(name, since, until) for name in self.habits}
+
+    def group_by_period_type(self) -> list:
+        """
+        Lists habits grouped by period type, in the shape of db.group_by_period_type.
+        """
+        groups = {}
+        for habit in self.habits.values():
+            groups.setdefault(int(habit.period_type), []).append(habit.name)
+        return [(period_type, ",".join(names)) for period_type, names in sorted(groups.items())]
+
+    def period_counts(self, name: str) -> list:
+        """
+        :return: list: (period_ordinal, count) pairs of the habit in ascending order
+        """
+        habit = self._habit(name)
+        events = self._events[habit.id]
+        if np is not None and len(events) >= analyse.NUMPY_THRESHOLD:
+            periods, counts = np.unique(_np_ordinals(events, habit.period_type), return_counts=True)
+            return list(zip(periods.tolist(), counts.tolist()))
+        ordinals = (analyse.epoch_period_ordinal(ts, habit.period_type) for ts in events)
+        return [(ordinal, sum(1 for _ in group)) for ordinal, group in groupby(ordinals)]
+
+    def streak_analyse(self, name: str) -> tuple:
+        """
+        :return: tuple: longest streak, period_type, like analyse.streak_analyse
+        """
+        habit = self._habit(name)
+        good_periods = [o for o, count in self.period_counts(name) if count >= habit.period_count]
+        return analyse.longest_run(good_periods), habit.period_type
+
+    def current_streak(self, name: str, now: datetime = None) -> tuple:
+        """
+        :return: tuple: current streak, period_type, like analyse.current_streak
+        """
+        habit = self._habit(name)
+        now_ordinal = analyse.period_ordinal(now or datetime.now(), habit.period_type)
+        _, current = analyse.sorted_streaks(self.period_counts(name), habit.period_count, now_ordinal)
+        return current, habit.period_type
+
+    def all_streaks(self, now: datetime = None) -> list:
+        """
+        :return: list: HabitStreak entries ranked like analyse.all_streaks
+        """
+        now = now or datetime.now()
+        result = []
+        for habit in sorted(self.habits.values(), key=lambda h: h.id):
+            now_ordinal = analyse.period_ordinal(now, habit.period_type)
+            longest, current = analyse.sorted_streaks(self.period_counts(habit.name), habit.period_count, now_ordinal)
+            result.append(analyse.HabitStreak(habit.name, longest, current, habit.period_type))
+        result.sort(key=lambda streak: (streak.longest, streak.current), reverse=True)
+        return result
+
+def _np_ordinals(events, period_type: database.UnitNames):
+    """
+    analyse.epoch_period_ordinal for a whole array at once.
+    """
+    ts = np.frombuffer(events, dtype=np.int64)
+    if period_type is database.UnitNames.PERIOD_DAILY:
+        return ts // 86400 + analyse.EPOCH_DAY
+    elif period_type is database.UnitNames.PERIOD_WEEKLY:
+        return (ts // 86400 + analyse.EPOCH_DAY - 1) // 7
+    elif period_type is database.UnitNames.PERIOD_MONTHLY:
+        # months since 1970-01 plus the ordinal of 1970-01
+        return ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+    else:
+        raise ValueError("Unknown period type")
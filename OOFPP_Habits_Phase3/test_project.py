@@ -1,21 +1,44 @@
 # tests/test_project.py
 import pytest
+import asyncio
+import json
 import os
 import sqlite3
+import subprocess
+import sys
 import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
 
 from db import (
     create_tables, add_counter, get_habit_names, exist,
     find_counter_by_name, get_period_count, get_period_type,
     increment_counter, get_counter_data, group_by_period_type,
-    delete_counter, UnitNames
+    delete_counter, UnitNames, migrate, schema_version, MIGRATIONS,
+    rebuild_period_rollup, connect, get_db, ConnectionPool, count_counter_events,
+    transaction, to_epoch, from_epoch, iter_counter_data, iter_period_counts
 )
+from counter import add_event, add_events, delete_event, read_events_csv, read_events_jsonl
 from analyse import (
-    count_events,
+    count_events, count_all_events,
     period_index, previous_period, next_period,
-    longest_streak, streak_analyse
+    longest_streak, streak_analyse,
+    period_ordinal, index_to_ordinal, ordinal_to_index, ordinal_streak,
+    all_streaks, current_streak, epoch_period_ordinal,
+    last_periods, count_events_last, streak_analyse_last
 )
+import analyse
+import db as database
+from store import EventStore
+from report import completion_report, hour_histogram, weekday_histogram
+from parallel import parallel_all_streaks, id_ranges
+from async_db import AsyncHabits
+import instrument
+from shards import ShardRouter
+from compaction import compact
+import transfer
+import main
 
 class TestDB:
     def setup_method(self, method):
@@ -30,7 +53,10 @@ class TestDB:
 
     def teardown_method(self, method):
         self.db.close()
-        os.remove(self.db_path)
+        database.invalidate_metadata()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
 
     def test_create_tables(self):
         select_string = "SELECT name FROM sqlite_master WHERE type='table';"
@@ -55,6 +81,117 @@ class TestDB:
         add_counter(self.db, "run", "running daily", UnitNames.PERIOD_DAILY, 1)
         assert exist(self.db, 1)
 
+    def test_migrations(self):
+        assert schema_version(self.db) == 0
+        create_tables(self.db)
+        assert schema_version(self.db) == len(MIGRATIONS)
+        # running it again is a no-op
+        assert migrate(self.db) == len(MIGRATIONS)
+
+        plan = self.db.execute(
+            "EXPLAIN QUERY PLAN SELECT counter_id, timestamp FROM tracker WHERE counter_id = ?", (1,)
+        ).fetchall()
+        assert "idx_tracker_counter_timestamp" in " ".join(str(row[-1]) for row in plan)
+        # idx_counter_name only covers the lookups, the table constraint keeps names unique
+        indexes = {row[1]: row[2] for row in self.db.execute("PRAGMA index_list(counter)")}
+        assert indexes["idx_counter_name"] == 0 and sum(indexes.values()) == 1
+
+    def test_migrate_tracker_to_epoch(self, monkeypatch):
+        # a database as it was before the timestamps became integers
+        monkeypatch.setattr(database, "MIGRATIONS", MIGRATIONS[:4])
+        create_tables(self.db)
+        self.db.execute("INSERT INTO counter (name, description, period_type, period_count) VALUES ('run', '', 1, 1)")
+        for ts in ("2025-07-16 23:59:59", "2025-07-17 00:00:00", "1969-12-31 12:00:00"):
+            self.db.execute("INSERT INTO tracker (counter_id, timestamp) VALUES (1, ?)", (ts,))
+        self.db.execute("INSERT INTO tracker (counter_id, timestamp) VALUES (1, '2025-07-20 10:00:00')")
+        self.db.execute("DELETE FROM tracker WHERE id = 4")
+        self.db.commit()
+        rollup = self.db.execute("SELECT * FROM tracker_period_rollup ORDER BY 2").fetchall()
+        monkeypatch.undo()
+
+        assert migrate(self.db) == len(MIGRATIONS)
+        rows = get_counter_data(self.db, 1)
+        assert [from_epoch(ts) for _, ts in rows] == [
+            datetime(1969, 12, 31, 12), datetime(2025, 7, 16, 23, 59, 59), datetime(2025, 7, 17)
+        ]
+        assert self.db.execute("SELECT timestamp FROM tracker_text WHERE id = 2").fetchone()[0] == "2025-07-17 00:00:00"
+
+        # the triggers now bucket the integers exactly like the old strings were bucketed
+        rebuild_period_rollup(self.db)
+        assert self.db.execute("SELECT * FROM tracker_period_rollup ORDER BY 2").fetchall() == rollup
+        increment_counter(self.db, 1, datetime(2025, 7, 18, 8, 0, 0))
+        assert streak_analyse(self.db, "run")[0] == 3
+        assert increment_counter(self.db, 1, None) is None
+        # IDs of deleted events are not reused after the table rebuild
+        assert self.db.execute("SELECT MAX(id) FROM tracker").fetchone()[0] == 6
+
+    def test_connection_pragmas(self):
+        self.db.close()
+        self.db = get_db(self.db_path, cache_size=-1000)
+        assert self.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert self.db.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert self.db.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert self.db.execute("PRAGMA cache_size").fetchone()[0] == -1000
+
+        reader = connect(self.db_path, read_only=True)
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM counter")
+        reader.close()
+
+    def test_connection_pool(self):
+        pool = ConnectionPool(self.db_path, readers=3)
+        with pool.writer() as db:
+            run_id = add_counter(db, "run", "running daily", UnitNames.PERIOD_DAILY, 1)
+
+        def write():
+            for i in range(100):
+                with pool.writer() as db:
+                    increment_counter(db, run_id, datetime(2025, 1, 1) + timedelta(days=i))
+
+        seen = []
+
+        def read():
+            for _ in range(50):
+                with pool.reader() as db:
+                    seen.append(count_counter_events(db, run_id))
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(seen) == 200 and all(0 <= n <= 100 for n in seen)
+        with pool.reader() as db:
+            assert count_counter_events(db, run_id) == 100
+        pool.close()
+
+    def test_metadata_cache_isolation(self):
+        a = get_db(self.db_path)
+        b = connect(self.db_path)
+        try:
+            with transaction(a):
+                add_counter(a, "swim", "", UnitNames.PERIOD_DAILY, 1)
+                assert find_counter_by_name(a, "swim") == 1
+                # the uncommitted habit stays invisible to other connections
+                assert find_counter_by_name(b, "swim") is None
+            assert find_counter_by_name(b, "swim") == 1
+            # connections opened by connect() are not kept alive by the cache
+            assert id(a) not in database._memory_keys and id(b) not in database._memory_keys
+
+            # another process replaces the habit, bypassing the functions that drop the cache
+            assert database.find_habit(a, "swim").period_type is UnitNames.PERIOD_DAILY
+            with sqlite3.connect(self.db_path) as other:
+                other.execute("DELETE FROM counter WHERE name = 'swim'")
+                other.execute("INSERT INTO counter (name, description, period_type, period_count) "
+                              "VALUES ('swim', '', 2, 3)")
+            other.close()
+            assert database.find_habit(a, "swim") == database.HabitMeta(2, "swim", UnitNames.PERIOD_WEEKLY, 3)
+            increment_counter(a, find_counter_by_name(b, "swim"), datetime(2025, 7, 17))
+        finally:
+            a.close()
+            b.close()
+
 
 class TestFunctions:
     def setup_method(self, method):
@@ -98,6 +235,21 @@ class TestFunctions:
         rows = get_counter_data(self.db, run_id)
         assert len(rows) == 3
 
+    def test_iter_counter_data(self):
+        run_id = find_counter_by_name(self.db, "run")
+        days = [self.dt + timedelta(days=i) for i in (5, 0, 3, 1, 2, 4)]
+        add_events(self.db, (("run", day) for day in days))
+
+        rows = iter_counter_data(self.db, run_id, batch_size=2)
+        assert next(rows) == (run_id, to_epoch(self.dt))
+        assert [from_epoch(ts) for _, ts in rows] == sorted(days)[1:]
+
+        window = iter_counter_data(self.db, run_id, since=days[3], until=days[2], batch_size=4, descending=True)
+        assert [from_epoch(ts) for _, ts in window] == [days[4], days[3]]
+
+        assert [o for o, _ in iter_period_counts(self.db, run_id, batch_size=1)] == \
+            [period_ordinal(day, UnitNames.PERIOD_DAILY) for day in sorted(days)]
+
     def test_count_events_helper(self):
         water_id = find_counter_by_name(self.db, "water")
         assert count_events(self.db, "water") == 0
@@ -108,6 +260,153 @@ class TestFunctions:
 
         # count_events uses the analyse.count_events wrapper
         assert count_events(self.db, "water") == 4
+        assert count_events(self.db, "water", since=datetime(2025, 7, 1)) == 3
+        assert count_events(self.db, "water", until=datetime(2025, 7, 17, 14, 0, 0)) == 2
+
+    def test_count_all_events(self):
+        increment_counter(self.db, find_counter_by_name(self.db, "run"), datetime(2025, 7, 17, 12, 0, 0))
+        increment_counter(self.db, find_counter_by_name(self.db, "gym"), datetime(2025, 7, 17, 12, 0, 0))
+        increment_counter(self.db, find_counter_by_name(self.db, "gym"), datetime(2025, 7, 18, 12, 0, 0))
+
+        assert count_all_events(self.db) == {"run": 1, "yoga": 0, "water": 0, "gym": 2}
+        assert count_all_events(self.db, since=datetime(2025, 7, 18)) == {"run": 0, "yoga": 0, "water": 0, "gym": 1}
+
+    def test_add_events_bulk(self):
+        start = datetime(2025, 1, 1, 8, 0, 0)
+        events = ((name, start + timedelta(hours=i)) for i in range(1000) for name in ("run", "water"))
+        assert add_events(self.db, events) == 2000
+        assert count_events(self.db, "run") == 1000
+        assert count_events(self.db, "water") == 1000
+
+        # an unknown habit aborts the whole batch
+        with pytest.raises(ValueError):
+            add_events(self.db, [("run", start), ("swim", start)])
+        assert count_events(self.db, "run") == 1000
+
+    def test_add_event_and_add_events(self):
+        # the same events one by one and in bulk, benchmarks/bench_add_events.py compares their speed
+        n = 200
+        for i in range(n):
+            add_event("run", self.db, self.dt + timedelta(days=i))
+        add_events(self.db, (("water", self.dt + timedelta(days=i)) for i in range(n)))
+        assert count_events(self.db, "run") == count_events(self.db, "water") == n
+        assert [ts for _, ts in get_counter_data(self.db, find_counter_by_name(self.db, "run"))] == \
+            [ts for _, ts in get_counter_data(self.db, find_counter_by_name(self.db, "water"))]
+
+    def test_read_events_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "events.csv")
+            with open(csv_path, "w") as f:
+                f.write("name,timestamp\nrun,2025-07-17 12:00:00\nyoga,2025-07-18 12:00:00\n")
+            jsonl_path = os.path.join(tmp, "events.jsonl")
+            with open(jsonl_path, "w") as f:
+                f.write('{"name": "gym", "timestamp": "2025-07-17 12:00:00"}\n\n')
+
+            assert list(read_events_csv(csv_path)) == [
+                ("run", datetime(2025, 7, 17, 12, 0, 0)), ("yoga", datetime(2025, 7, 18, 12, 0, 0))
+            ]
+            assert add_events(self.db, read_events_jsonl(jsonl_path)) == 1
+        assert count_events(self.db, "gym") == 1
+
+    def test_period_rollup(self):
+        def rollup():
+            return self.db.execute(
+                "SELECT counter_id, period_ordinal, count FROM tracker_period_rollup ORDER BY 1, 2"
+            ).fetchall()
+
+        start = datetime(2024, 12, 20, 23, 30, 0)
+        events = [(name, start + timedelta(hours=7 * i)) for i in range(300) for name in ("run", "yoga")]
+        add_events(self.db, events)
+
+        expected = {}
+        for name, ts in events:
+            _id = find_counter_by_name(self.db, name)
+            key = (_id, period_ordinal(ts, UnitNames(get_period_type(self.db, _id))))
+            expected[key] = expected.get(key, 0) + 1
+        triggered = rollup()
+        assert triggered == sorted((*key, cnt) for key, cnt in expected.items())
+
+        rebuild_period_rollup(self.db)
+        assert rollup() == triggered
+
+        # removing events and habits keeps the rollup in sync
+        self.db.execute("DELETE FROM tracker WHERE id % 3 = 0")
+        delete_counter(self.db, find_counter_by_name(self.db, "yoga"))
+        triggered = rollup()
+        rebuild_period_rollup(self.db)
+        assert rollup() == triggered
+        assert count_events(self.db, "run") == 200
+
+    def test_transaction(self):
+        other = sqlite3.connect(self.db_path)
+        with transaction(self.db):
+            swim_id = add_counter(self.db, "swim", "swimming", UnitNames.PERIOD_WEEKLY, 1)
+            with transaction(self.db):
+                increment_counter(self.db, swim_id, self.dt)
+            add_event("swim", self.db, self.dt)
+            # nothing is committed before the outermost block ends
+            assert other.execute("SELECT COUNT(*) FROM counter WHERE name = 'swim'").fetchone()[0] == 0
+        assert other.execute("SELECT COUNT(*) FROM tracker").fetchone()[0] == 2
+        other.close()
+
+        cache = analyse.enable_streak_cache()
+        try:
+            assert streak_analyse(self.db, "swim")[0] == 1
+            with pytest.raises(ValueError):
+                with transaction(self.db):
+                    increment_counter(self.db, swim_id, self.dt + timedelta(weeks=1))
+                    assert streak_analyse(self.db, "swim")[0] == 2
+                    add_events(self.db, [("swim", self.dt), ("nope", self.dt)])
+            # the whole block is rolled back, also for the cache
+            assert count_events(self.db, "swim") == 2
+            assert streak_analyse(self.db, "swim")[0] == 1
+            assert cache.misses == 2
+        finally:
+            analyse.disable_streak_cache()
+
+    def test_transaction_caught_errors(self):
+        run_id = find_counter_by_name(self.db, "run")
+        with transaction(self.db):
+            increment_counter(self.db, run_id, self.dt)
+            # a failed batch leaves none of its events behind
+            with pytest.raises(sqlite3.IntegrityError):
+                database.increment_counter_many(self.db, [(run_id, self.dt), (99, self.dt)])
+            # a failed nested block is undone, the outer one goes on
+            with pytest.raises(ValueError):
+                with transaction(self.db):
+                    increment_counter(self.db, run_id, self.dt + timedelta(days=1))
+                    add_counter(self.db, "swim", "swimming", UnitNames.PERIOD_WEEKLY, 1)
+                    raise ValueError
+            assert find_counter_by_name(self.db, "swim") is None
+            increment_counter(self.db, run_id, self.dt + timedelta(days=2))
+        assert [from_epoch(ts) for _, ts in get_counter_data(self.db, run_id)] == \
+            [self.dt, self.dt + timedelta(days=2)]
+        assert set(get_habit_names(self.db)) == {"run", "yoga", "water", "gym"}
+
+    def test_habit_metadata_cache(self):
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        for _ in range(3):
+            streak_analyse(self.db, "run")
+            current_streak(self.db, "yoga", self.dt)
+        assert sum("FROM counter" in sql for sql in statements) == 1
+        self.db.set_trace_callback(None)
+
+        # other connections to the same file share the cache
+        other = sqlite3.connect(self.db_path)
+        assert database.find_habit(other, "water") == database.HabitMeta(3, "water", UnitNames.PERIOD_DAILY, 4)
+
+        swim_id = add_counter(self.db, "swim", "swimming", UnitNames.PERIOD_WEEKLY, 1)
+        assert find_counter_by_name(other, "swim") == swim_id
+        delete_event(self.db, "swim")
+        assert find_counter_by_name(other, "swim") is None
+        with pytest.raises(ValueError):
+            with transaction(self.db):
+                add_counter(self.db, "swim", "swimming", UnitNames.PERIOD_WEEKLY, 1)
+                assert find_counter_by_name(self.db, "swim") is not None
+                raise ValueError("rollback")
+        assert find_counter_by_name(self.db, "swim") is None
+        other.close()
 
     def test_group_by_period_type(self):
         groups : dict[int, str]
@@ -126,9 +425,26 @@ class TestFunctions:
         delete_counter(self.db, yoga_id)
         assert find_counter_by_name(self.db, "yoga") is None
 
+    def test_delete_counter_long_history(self):
+        run_id = find_counter_by_name(self.db, "run")
+        water_id = find_counter_by_name(self.db, "water")
+        add_events(self.db, (("run", self.dt - timedelta(days=i)) for i in range(3000)))
+        add_events(self.db, (("water", self.dt - timedelta(days=i)) for i in range(10)))
+        rollup = "SELECT COUNT(*) FROM tracker_period_rollup WHERE counter_id = ?"
+        assert self.db.execute(rollup, (run_id,)).fetchone()[0] == 3000
+
+        # the delete trigger only touches the period of each deleted event
+        delete_counter(self.db, run_id)
+        assert self.db.execute(rollup, (run_id,)).fetchone()[0] == 0
+        assert self.db.execute(rollup, (water_id,)).fetchone()[0] == 10
+        assert count_events(self.db, "water") == 10
+
     def teardown_method(self, method):
         self.db.close()
-        os.remove(self.db_path)
+        database.invalidate_metadata()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
 
     def test_period_index_and_navigation(self):
         # daily
@@ -162,6 +478,559 @@ class TestFunctions:
         # if requirement is 2 per period, none qualify
         assert longest_streak(counts, UnitNames.PERIOD_DAILY, required=2) == 0
 
+    def test_period_ordinals(self):
+        # consecutive periods differ by one, also across the year boundary
+        for period_type in UnitNames:
+            ts = datetime(2020, 12, 20)
+            idx = period_index(ts, period_type)
+            ordinal = period_ordinal(ts, period_type)
+            assert index_to_ordinal(idx, period_type) == ordinal
+            assert ordinal_to_index(ordinal, period_type) == idx
+            for _ in range(60):
+                nxt = next_period(idx, period_type)
+                assert index_to_ordinal(nxt, period_type) == index_to_ordinal(idx, period_type) + 1
+                idx = nxt
+
+    def test_period_calendar(self, monkeypatch):
+        # a small range, so the fallback past its ends is exercised too
+        monkeypatch.setattr(analyse, "_calendar", analyse.PeriodCalendar(2019, 2021))
+        day = datetime(2018, 12, 1)
+        while day < datetime(2022, 2, 1):
+            iso_year, iso_week, _ = day.isocalendar()
+            assert period_index(day, UnitNames.PERIOD_WEEKLY) == (iso_year, iso_week)
+            for period_type in UnitNames:
+                idx = period_index(day, period_type)
+                assert ordinal_to_index(period_ordinal(day, period_type), period_type) == idx
+                assert previous_period(next_period(idx, period_type), period_type) == idx
+            day += timedelta(days=1)
+
+        assert previous_period((2021, 1), UnitNames.PERIOD_WEEKLY) == (2020, 53)
+        assert next_period((2020, 2, 29), UnitNames.PERIOD_DAILY) == (2020, 3, 1)
+        with pytest.raises(ValueError):
+            next_period((2021, 2, 29), UnitNames.PERIOD_DAILY)
+        with pytest.raises(ValueError):
+            next_period((2021, 53), UnitNames.PERIOD_WEEKLY)
+
+    def test_epoch_period_ordinal(self):
+        for period_type in UnitNames:
+            for ts in (datetime(1969, 12, 31, 23, 0, 0), datetime(2024, 2, 29, 0, 0, 0), self.dt):
+                assert epoch_period_ordinal(to_epoch(ts), period_type) == period_ordinal(ts, period_type)
+
+    def test_ordinal_streak_paths(self, monkeypatch):
+        # 3000 daily events with a gap every 500 days, two events on the even days
+        ordinals = [d for d in range(730000, 733000) if d % 500 != 1] + list(range(730000, 733000, 2))
+        expected = 499
+        assert ordinal_streak(ordinals, required=1) == expected
+        assert ordinal_streak(ordinals, required=2) == 1
+
+        monkeypatch.setattr(analyse, "np", None)
+        assert ordinal_streak(ordinals, required=1) == expected
+        assert ordinal_streak(ordinals, required=2) == 1
+
+    def test_all_streaks(self):
+        run_id = find_counter_by_name(self.db, "run")
+        yoga_id = find_counter_by_name(self.db, "yoga")
+        # run: 3 days, gap, 2 days up to "today"; yoga: twice a week for 2 weeks, long ago
+        for day in (1, 2, 3, 5, 6):
+            increment_counter(self.db, run_id, datetime(2025, 7, day, 9, 0, 0))
+        for day in (7, 8, 14, 15):
+            increment_counter(self.db, yoga_id, datetime(2025, 4, day, 9, 0, 0))
+
+        ranking = all_streaks(self.db, now=datetime(2025, 7, 6, 20, 0, 0))
+        assert [s.name for s in ranking[:2]] == ["run", "yoga"]
+        assert ranking[0] == ("run", 3, 2, UnitNames.PERIOD_DAILY)
+        assert ranking[1] == ("yoga", 2, 0, UnitNames.PERIOD_WEEKLY)
+        for streak in ranking:
+            assert streak.longest == streak_analyse(self.db, streak.name)[0]
+
+    def test_future_events_ignored(self):
+        run_id = find_counter_by_name(self.db, "run")
+        now = datetime(2025, 7, 3, 20, 0, 0)
+        # two days up to now, then four days checked off ahead of time
+        for day in (2, 3, 4, 5, 6, 7):
+            increment_counter(self.db, run_id, datetime(2025, 7, day, 9, 0, 0))
+
+        expected = (2, UnitNames.PERIOD_DAILY)
+        assert {s.name: s.longest for s in all_streaks(self.db, now=now)}["run"] == 2
+        assert streak_analyse(self.db, "run", now=now) == expected
+        assert streak_analyse(self.db, "run", datetime(2025, 7, 1), datetime(2025, 7, 9), now=now) == expected
+        assert streak_analyse(self.db, "run", datetime(2025, 7, 1, 12), None, now=now) == expected
+        cache = analyse.enable_streak_cache()
+        try:
+            assert streak_analyse(self.db, "run", now=now) == expected
+            assert streak_analyse(self.db, "run", now=datetime(2025, 7, 7, 20, 0, 0))[0] == 6
+        finally:
+            analyse.disable_streak_cache()
+        assert cache.misses == 1
+
+    def test_current_streak(self):
+        water_id = find_counter_by_name(self.db, "water")
+        # water needs 4 a day: full on the 1st, 3rd, 4th, 5th, one event on the 6th
+        for day in (1, 3, 4, 5):
+            for hour in range(4):
+                increment_counter(self.db, water_id, datetime(2025, 7, day, 8 + hour, 0, 0))
+        increment_counter(self.db, water_id, datetime(2025, 7, 6, 8, 0, 0))
+
+        # the 6th is still open, so the streak of the 3rd–5th is kept
+        assert current_streak(self.db, "water", now=datetime(2025, 7, 6, 12, 0, 0)) == (3, UnitNames.PERIOD_DAILY)
+        assert current_streak(self.db, "water", now=datetime(2025, 7, 5, 23, 0, 0)) == (3, UnitNames.PERIOD_DAILY)
+        assert current_streak(self.db, "water", now=datetime(2025, 7, 1, 23, 0, 0))[0] == 1
+        # a full day without events breaks it
+        assert current_streak(self.db, "water", now=datetime(2025, 7, 7, 12, 0, 0))[0] == 0
+
+        for now in (datetime(2025, 7, d, 12, 0, 0) for d in range(1, 9)):
+            expected = {s.name: s.current for s in all_streaks(self.db, now=now)}["water"]
+            assert current_streak(self.db, "water", now=now)[0] == expected
+
+    def test_streak_cache(self):
+        def uncached():
+            # bypass the cache without unregistering its listener
+            analyse.streak_cache = None
+            result = streak_analyse(self.db, "run")
+            analyse.streak_cache = cache
+            return result
+
+        run_id = find_counter_by_name(self.db, "run")
+        cache = analyse.enable_streak_cache(persistent=True)
+        try:
+            for day in (1, 2, 3, 6, 7):
+                increment_counter(self.db, run_id, datetime(2025, 7, day, 9, 0, 0))
+            assert streak_analyse(self.db, "run") == (3, UnitNames.PERIOD_DAILY)
+            assert cache.misses == 1
+
+            # extending the newest run is applied in place
+            for day in (8, 9, 9, 10):
+                increment_counter(self.db, run_id, datetime(2025, 7, day, 9, 0, 0))
+                assert streak_analyse(self.db, "run") == uncached()
+            assert streak_analyse(self.db, "run")[0] == 5
+            assert cache.misses == 1
+
+            # an older event that joins two runs forces a recompute
+            increment_counter(self.db, run_id, datetime(2025, 7, 4, 9, 0, 0))
+            increment_counter(self.db, run_id, datetime(2025, 7, 5, 9, 0, 0))
+            assert streak_analyse(self.db, "run") == uncached() == (10, UnitNames.PERIOD_DAILY)
+            assert cache.misses == 2
+
+            # the persisted entry is used by a fresh cache, until someone writes bypassing the db module
+            cache = analyse.enable_streak_cache(persistent=True)
+            assert streak_analyse(self.db, "run")[0] == 10
+            assert (cache.hits, cache.misses) == (1, 0)
+            self.db.execute("DELETE FROM tracker WHERE timestamp >= ? AND timestamp < ?",
+                            (to_epoch(datetime(2025, 7, 5)), to_epoch(datetime(2025, 7, 6))))
+            assert streak_analyse(self.db, "run") == uncached() == (5, UnitNames.PERIOD_DAILY)
+            # the read didn't commit the pending delete of the caller
+            assert self.db.in_transaction
+            self.db.commit()
+
+            # read-only connections keep the result in memory only
+            pool = ConnectionPool(self.db_path, readers=1)
+            try:
+                cache.invalidate()
+                with pool.reader() as reader:
+                    assert streak_analyse(reader, "run") == (5, UnitNames.PERIOD_DAILY)
+            finally:
+                pool.close()
+
+            delete_counter(self.db, run_id)
+            assert (database.database_key(self.db), run_id) not in cache._entries
+        finally:
+            analyse.disable_streak_cache()
+
+    def test_event_store(self):
+        start = datetime(2024, 11, 25, 7, 0, 0)
+        events = [(name, start + timedelta(hours=9 * i)) for i in range(400) for name in ("run", "yoga", "water")]
+        events += [("gym", start + timedelta(days=3 * i)) for i in range(100)]
+        add_events(self.db, events)
+        now = datetime(2025, 2, 10, 12, 0, 0)
+
+        store = EventStore.load(self.db, batch_size=100)
+        assert store.nbytes() == 8 * len(events)
+        assert store.count_all_events() == count_all_events(self.db)
+        assert store.count_events("run", since=now) == count_events(self.db, "run", since=now)
+        assert {(t, frozenset(names.split(","))) for t, names in store.group_by_period_type()} == \
+            {(t, frozenset(names.split(","))) for t, names in group_by_period_type(self.db)}
+        assert store.all_streaks(now) == all_streaks(self.db, now)
+        for name in store.habits:
+            assert store.streak_analyse(name) == streak_analyse(self.db, name)
+            assert store.current_streak(name, now) == current_streak(self.db, name, now)
+
+        store.add_event("gym", start + timedelta(days=1))
+        assert store.habits["gym"].count == 101
+        assert list(store.timestamps("gym"))[:2] == [to_epoch(start), to_epoch(start + timedelta(days=1))]
+        with pytest.raises(AttributeError):
+            store.habits["gym"].streak = 3
+
+    def test_windowed_analysis(self):
+        # yoga needs 2 per week: 2 events every 5 days for 20 weeks
+        start = datetime(2025, 1, 1, 18, 0, 0)
+        events = [start + timedelta(days=5 * i, hours=h) for i in range(28) for h in (0, 1)]
+        add_events(self.db, (("yoga", ts) for ts in events))
+        yoga_ordinals = lambda lo, hi: [period_ordinal(ts, UnitNames.PERIOD_WEEKLY) for ts in events if lo <= ts < hi]
+
+        for since, until in [(datetime(2025, 1, 6), datetime(2025, 3, 3)),             # whole weeks
+                             (datetime(2025, 1, 21, 19, 0, 0), datetime(2025, 4, 2))]:  # partial weeks
+            expected = ordinal_streak(yoga_ordinals(since, until), required=2)
+            assert streak_analyse(self.db, "yoga", since, until) == (expected, UnitNames.PERIOD_WEEKLY)
+
+        now = datetime(2025, 3, 5, 12, 0, 0)
+        assert last_periods(4, UnitNames.PERIOD_WEEKLY, now) == (datetime(2025, 2, 10), datetime(2025, 3, 10))
+        assert count_events_last(self.db, "yoga", 4, now) == len(yoga_ordinals(*last_periods(4, UnitNames.PERIOD_WEEKLY, now)))
+        assert streak_analyse_last(self.db, "yoga", 4, now)[0] == \
+            ordinal_streak(yoga_ordinals(*last_periods(4, UnitNames.PERIOD_WEEKLY, now)), required=2)
+        assert streak_analyse_last(self.db, "yoga", 1000, datetime(2025, 6, 1)) == streak_analyse(self.db, "yoga")
+
+    def test_reports(self):
+        # water needs 4 a day: 4 on Mon 14th, 2 on Tue 15th, 5 on Thu 17th (the "now" day)
+        for day, n in ((14, 4), (15, 2), (17, 5)):
+            add_events(self.db, (("water", datetime(2025, 7, day, 8 + h, 30, 0)) for h in range(n)))
+        add_events(self.db, [("run", datetime(2025, 7, 17, 23, 59, 59))])
+        report = {r.name: r for r in completion_report(self.db, now=self.dt)}
+
+        water = report["water"]
+        assert (water.events, water.periods_elapsed, water.periods_met) == (11, 4, 2)
+        assert water.completion_rate == 0.5
+        assert water.success_ratio == (4 + 2 + 4) / 16
+        assert report["run"].completion_rate == 1.0
+        assert report["yoga"] == ("yoga", UnitNames.PERIOD_WEEKLY, 2, 0, 0, 0, 0.0, 0.0)
+
+        hours = hour_histogram(self.db)
+        assert hours["water"][8:13] == [3, 3, 2, 2, 1] and sum(hours["water"]) == 11
+        assert hours["run"][23] == 1 and hours["gym"] == [0] * 24
+        assert weekday_histogram(self.db)["water"] == [4, 2, 0, 5, 0, 0, 0]
+        assert weekday_histogram(self.db, since=datetime(2025, 7, 16))["water"] == [0, 0, 0, 5, 0, 0, 0]
+
+    def test_parallel_all_streaks(self):
+        for i in range(20):
+            add_counter(self.db, f"habit-{i}", "", UnitNames(i % 3 + 1), i % 2 + 1)
+        names = get_habit_names(self.db)
+        add_events(self.db, ((name, self.dt - timedelta(days=(i * 7 + len(name)) % 90, hours=i % 5))
+                             for i in range(2000) for name in names[i % len(names):i % len(names) + 1]))
+
+        assert id_ranges(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+        assert id_ranges(5, 5, 4) == [(5, 5)]
+        assert parallel_all_streaks(self.db_path, workers=2, now=self.dt) == all_streaks(self.db, now=self.dt)
+
+        # the ID ranges only span the habits of the tenant
+        add_counter(self.db, "run", "", UnitNames.PERIOD_DAILY, 1, tenant="bob")
+        add_event("run", self.db, self.dt, tenant="bob")
+        assert database.get_counter_id_range(self.db, "bob") == (25, 25)
+        assert parallel_all_streaks(self.db_path, workers=2, now=self.dt, tenant="bob") == \
+            all_streaks(self.db, now=self.dt, tenant="bob")
+
+    def test_async_habits(self):
+        async def scenario():
+            async with AsyncHabits(self.db_path, readers=2) as habits:
+                await habits.add_counter("swim", "swimming", UnitNames.PERIOD_DAILY, 1)
+                await asyncio.gather(*(habits.add_event("swim", self.dt - timedelta(days=i % 10))
+                                       for i in range(500)))
+                with pytest.raises(ValueError):
+                    await habits.add_event("dance")
+                assert await habits.count_events("swim") == 500
+                assert await habits.streak_analyse("swim") == (10, UnitNames.PERIOD_DAILY)
+                assert (await habits.current_streak("swim", self.dt))[0] == 10
+                await habits.delete_habit("swim")
+                assert "swim" not in await habits.get_habit_names()
+                # concurrent check-ins were coalesced into few transactions
+                return habits.batches
+
+        assert asyncio.run(scenario()) < 500
+
+    @pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+    def test_async_habits_stopped(self):
+        async def scenario():
+            habits = AsyncHabits(self.db_path, readers=1)
+            await habits.add_event("run", self.dt)
+            # the writer thread dies with check-ins in flight
+            def fail(db, events):
+                raise OSError("disk full")
+            habits._write_events = fail
+            with pytest.raises(RuntimeError) as info:
+                await asyncio.wait_for(habits.add_event("run", self.dt), 5)
+            assert isinstance(info.value.__cause__, OSError)
+            with pytest.raises(RuntimeError):
+                await habits.add_event("run", self.dt)
+            await habits.close()
+
+            habits = AsyncHabits(self.db_path, readers=1)
+            await habits.close()
+            with pytest.raises(RuntimeError):
+                await habits.add_counter("swim", "swimming", UnitNames.PERIOD_DAILY, 1)
+
+        asyncio.run(scenario())
+        assert count_events(self.db, "run") == 1
+
+    def test_command_line(self, capsys):
+        self.db.commit()
+        assert main.main(["--db", self.db_path, "add", "swim", "--period", "weekly", "--count", "2"]) == 0
+        assert main.main(["--db", self.db_path, "done", "swim", "run", "--at", "2025-07-17 08:00"]) == 0
+        assert main.main(["--db", self.db_path, "done", "swim", "--at", "2025-07-18"]) == 0
+        # an unknown habit fails the whole command
+        assert main.main(["--db", self.db_path, "done", "run", "dance"]) == 1
+        capsys.readouterr()
+
+        assert main.main(["--db", self.db_path, "count", "run"]) == 0
+        assert capsys.readouterr().out == "1\n"
+        assert main.main(["--db", self.db_path, "streak", "--all", "--json"]) == 0
+        streaks = json.loads(capsys.readouterr().out)
+        assert streaks[:2] == [{"name": "run", "longest": 1, "current": 0, "period": "daily"},
+                               {"name": "swim", "longest": 1, "current": 0, "period": "weekly"}]
+        with pytest.raises(SystemExit):
+            main.main(["--db", self.db_path, "done", "run", "--at", "yesterday"])
+
+    def test_command_line_skips_questionary(self):
+        # the non-interactive commands must not import prompt-toolkit or NumPy
+        code = ("import sys, main; main.main(sys.argv[1:]); "
+                "print('questionary' in sys.modules, 'numpy' in sys.modules)")
+        out = subprocess.run([sys.executable, "-c", code, "--db", self.db_path, "list"],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        *names, imported = out.splitlines()
+        assert sorted(names) == ["gym", "run", "water", "yoga"]
+        assert imported == "False False"
+
+    def test_instrumentation(self, capsys):
+        run_id = find_counter_by_name(self.db, "run")
+        for day in range(3):
+            increment_counter(self.db, run_id, self.dt + timedelta(days=day))
+        database.invalidate_metadata()
+
+        with instrument.profile(self.db) as stats:
+            assert analyse.streak_analyse(self.db, "run")[0] == 3
+            # the metadata is cached now, only the rollup is read
+            assert analyse.streak_analyse(self.db, "run")[0] == 3
+        assert analyse.streak_analyse is streak_analyse
+        assert stats.functions["analyse.streak_analyse"].count == 2
+        assert stats.functions["db.find_habit"].count == 2
+        statements = {s["sql"]: s["count"] for s in stats.snapshot()["statements"]}
+        assert statements["SELECT id, name, period_type, period_count FROM counter WHERE tenant = ?"] == 1
+        # self.db is a plain sqlite3 connection: it has no db.Connection to remember its file
+        assert statements.pop("PRAGMA database_list") == 3
+        # every lookup checks that no other connection changed the habits
+        assert statements.pop("SELECT version FROM metadata_version WHERE id = ?") == 2
+        assert sum(statements.values()) == stats.statement_count - 5 == 3
+
+        text = stats.to_prometheus()
+        assert 'habits_function_duration_seconds_count{function="analyse.streak_analyse"} 2' in text
+        assert 'habits_function_duration_seconds_bucket{function="db.find_habit",le="+Inf"} 2' in text
+        assert "counter_id = ? AND count >= ?" in text
+
+        self.db.commit()
+        assert main.main(["--db", self.db_path, "--profile", "json", "count", "run"]) == 0
+        captured = capsys.readouterr()
+        assert captured.out == "3\n"
+        assert json.loads(captured.err)["functions"]["main.count"]["count"] == 1
+        assert instrument.instrumentation is None
+
+    def test_sharded_tenants(self):
+        # the same habit names for many users, spread over 4 files
+        with tempfile.TemporaryDirectory() as tmp:
+            with ShardRouter(tmp, shards=4) as router:
+                tenants = [f"user-{i}" for i in range(20)]
+                for i, tenant in enumerate(tenants):
+                    router.add_habit(tenant, "run", "running", UnitNames.PERIOD_DAILY, 1)
+                    for day in range(i):
+                        router.add_event(tenant, "run", self.dt + timedelta(days=day))
+                assert len({router.shard_of(tenant) for tenant in tenants}) == 4
+
+                db = router.get_db("user-7")
+                assert streak_analyse(db, "run", tenant="user-7")[0] == 7
+                assert count_events(db, "run", tenant="user-7") == 7
+                assert get_habit_names(db, "user-7") == ["run"]
+                with pytest.raises(ValueError):
+                    streak_analyse(db, "run")
+                with pytest.raises(sqlite3.IntegrityError):
+                    router.add_habit("user-7", "run", "again", UnitNames.PERIOD_DAILY, 1)
+
+                assert router.tenant_event_counts() == {tenant: i for i, tenant in enumerate(tenants)}
+                assert router.tenant_event_counts(since=self.dt + timedelta(days=18)) == {
+                    tenant: max(i - 18, 0) for i, tenant in enumerate(tenants)}
+                reports = router.completion_reports(self.dt + timedelta(days=19))
+                assert reports["user-19"][0].periods_met == 19
+                assert reports["user-0"][0].events == 0
+                assert [s.longest for s in router.all_streaks("user-3")] == [3]
+                # compacted check-ins still count for the days inside the range
+                since = datetime(2025, 7, 20)
+                counts = router.tenant_event_counts(since=since)
+                compact(router.get_db("user-19"), datetime(2025, 7, 30))
+                assert router.tenant_event_counts(since=since) == counts
+                assert counts["user-19"] == count_events(router.get_db("user-19"), "run", since=since,
+                                                         tenant="user-19") == 16
+                stats = router.shard_stats()
+                assert sum(s.tenants for s in stats) == 20
+                assert sum(s.events for s in stats) == sum(range(20))
+
+            with pytest.raises(ValueError):
+                ShardRouter(tmp, shards=8)
+
+    def test_migrate_counter_tenant(self):
+        self.db.execute("PRAGMA user_version = 5")
+        self.db.commit()
+        run_id = find_counter_by_name(self.db, "run")
+        increment_counter(self.db, run_id, self.dt)
+        # rebuild the table as it was before the tenants
+        self.db.execute("PRAGMA foreign_keys = OFF")
+        self.db.executescript("""
+        DROP TRIGGER trg_tracker_rollup_insert;
+        DROP TRIGGER trg_tracker_rollup_delete;
+        CREATE TABLE counter_old AS SELECT id, name, description, period_type, period_count FROM counter;
+        DROP TABLE counter;
+        ALTER TABLE counter_old RENAME TO counter;
+        """)
+        database._create_rollup_triggers(self.db.cursor(), database.period_ordinal_sql)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        database.invalidate_metadata()
+
+        assert migrate(self.db) == len(MIGRATIONS)
+        assert self.db.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert count_events(self.db, "run") == 1
+        assert set(get_habit_names(self.db)) == {"run", "yoga", "water", "gym"}
+        assert add_counter(self.db, "run", "other user", UnitNames.PERIOD_DAILY, 1, tenant="bob") == 5
+        increment_counter(self.db, run_id, self.dt + timedelta(days=1))
+        assert streak_analyse(self.db, "run")[0] == 2
+
+    def test_compaction(self):
+        run_id = find_counter_by_name(self.db, "run")
+        yoga_id = find_counter_by_name(self.db, "yoga")
+        for day in range(60):
+            if day % 9:
+                increment_counter(self.db, run_id, self.dt + timedelta(days=day, hours=day % 5))
+            increment_counter(self.db, yoga_id, self.dt + timedelta(days=day, minutes=day))
+        now = self.dt + timedelta(days=60)
+        since, until = datetime(2025, 7, 20), datetime(2025, 8, 30)
+
+        def results():
+            store = EventStore.load(self.db)
+            return (
+                [streak_analyse(self.db, name) for name in ("run", "yoga")],
+                streak_analyse(self.db, "run", since=since, until=until),
+                streak_analyse(self.db, "yoga", since=since, until=now),
+                all_streaks(self.db, now),
+                count_events(self.db, "run"), count_events(self.db, "run", since=since, until=until),
+                count_all_events(self.db, since=since),
+                store.streak_analyse("yoga"), store.count_events("run", since=since),
+                weekday_histogram(self.db), weekday_histogram(self.db, since=since, until=until),
+            )
+
+        expected = results()
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "archive.db")
+            with transaction(self.db):
+                with pytest.raises(ValueError):
+                    compact(self.db, now, archive)
+
+            result = compact(self.db, datetime(2025, 8, 25, 18), archive)
+            assert result.horizon == datetime(2025, 8, 25)
+            # 39 days before the horizon, one check-in per habit and day
+            raw = sum(1 for day in range(39) if day % 9) + 39
+            assert result.rows_compacted == result.rows_archived == result.days_compacted == raw
+            assert result.bytes_reclaimed == result.bytes_before - result.bytes_after
+            assert self.db.execute("SELECT COUNT(*) FROM tracker WHERE timestamp < ?",
+                                   (to_epoch(result.horizon),)).fetchone()[0] == 0
+            assert results() == expected
+            # only the hours of the raw check-ins are left
+            assert sum(hour_histogram(self.db)["run"]) == count_events(self.db, "run") - raw + 39
+            rebuild_period_rollup(self.db)
+            assert results() == expected
+
+            with sqlite3.connect(archive) as archived:
+                assert archived.execute("SELECT COUNT(*) FROM tracker").fetchone()[0] == raw
+                assert archived.execute("SELECT name FROM counter ORDER BY id").fetchall() == [("run",), ("yoga",)]
+            archived.close()
+            # a second run finds nothing left to move
+            assert compact(self.db, result.horizon, archive).rows_compacted == 0
+
+            # a broken archive fails with its own error and leaves nothing attached
+            broken = os.path.join(tmp, "broken.db")
+            with sqlite3.connect(broken) as archived:
+                archived.execute("CREATE TABLE tracker (id INTEGER PRIMARY KEY, counter_id INTEGER, timestamp INTEGER)")
+                archived.execute("CREATE TRIGGER full BEFORE INSERT ON tracker BEGIN SELECT RAISE(ABORT, 'archive full'); END")
+            archived.close()
+            increment_counter(self.db, run_id, datetime(2025, 8, 1))
+            with pytest.raises(sqlite3.IntegrityError, match="archive full"):
+                compact(self.db, result.horizon, broken)
+            assert "archive" not in [row[1] for row in self.db.execute("PRAGMA database_list")]
+            assert compact(self.db, result.horizon).rows_compacted == 1
+            triggers = {row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+            assert triggers.issuperset(database._TRACKER_TRIGGERS)
+            assert count_events(self.db, "run") == expected[4] + 1
+
+        # files created with auto_vacuum = INCREMENTAL give the pages back
+        db = connect(self.db_path + "-vacuum")
+        try:
+            create_tables(db)
+            _id = add_counter(db, "run", "", UnitNames.PERIOD_DAILY, 1)
+            database.increment_counter_many(db, ((_id, self.dt + timedelta(minutes=i)) for i in range(20000)))
+            result = compact(db, self.dt + timedelta(days=30))
+            assert result.rows_compacted == 20000 and result.pages_vacuumed > 0
+            assert result.bytes_reclaimed > 0
+            assert count_events(db, "run") == 20000
+        finally:
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.db_path + "-vacuum" + suffix):
+                    os.remove(self.db_path + "-vacuum" + suffix)
+
+    @pytest.mark.parametrize("suffix", [".jsonl", ".npz", ".arrow"])
+    def test_export_import(self, suffix):
+        if suffix == ".arrow":
+            pytest.importorskip("pyarrow")
+        run_id = find_counter_by_name(self.db, "run")
+        yoga_id = find_counter_by_name(self.db, "yoga")
+        add_counter(self.db, "run", "bob's", UnitNames.PERIOD_WEEKLY, 1, tenant="bob")
+        for day in range(40):
+            increment_counter(self.db, run_id, self.dt + timedelta(days=day))
+            increment_counter(self.db, yoga_id, self.dt + timedelta(days=day // 2, hours=day % 2))
+        add_event("run", self.db, self.dt, tenant="bob")
+        compact(self.db, self.dt + timedelta(days=10))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "habits" + suffix)
+            # small chunks, so the files have several of them
+            assert transfer.export_database(self.db, path, chunk_size=16) == (5, 50, 21)
+            target = sqlite3.connect(os.path.join(tmp, "target.db"))
+            try:
+                create_tables(target)
+                assert transfer.import_database(target, path, chunk_size=16) == (5, 50, 21)
+                for name in ("run", "yoga"):
+                    assert streak_analyse(target, name) == streak_analyse(self.db, name)
+                    assert count_events(target, name) == count_events(self.db, name)
+                assert count_events(target, "run", tenant="bob") == 1
+                rollup = "SELECT * FROM tracker_period_rollup ORDER BY 1, 2"
+                assert target.execute(rollup).fetchall() == self.db.execute(rollup).fetchall()
+                # the per-row triggers are back after the bulk load
+                increment_counter(target, run_id, self.dt + timedelta(days=40))
+                assert streak_analyse(target, "run")[0] == 41
+
+                # importing again adds the events to the existing habits, all or nothing
+                assert transfer.import_database(target, path) == (5, 50, 21)
+                assert count_events(target, "run") == 81
+                with open(path, "r+b") as f:
+                    f.truncate(os.path.getsize(path) * 2 // 3)
+                with pytest.raises(Exception):
+                    transfer.import_database(target, path)
+                assert count_events(target, "run") == 81
+                with pytest.raises(ValueError):
+                    transfer.export_database(target, os.path.join(tmp, "habits.csv"))
+            finally:
+                target.close()
+
+    def test_load_events_failure(self):
+        run_id = find_counter_by_name(self.db, "run")
+        triggers = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+        expected = self.db.execute(triggers).fetchone()[0]
+        with transaction(self.db):
+            increment_counter(self.db, run_id, self.dt)
+            # a caller catching the error and committing the rest keeps the triggers
+            with pytest.raises(sqlite3.IntegrityError):
+                database.load_events(self.db, [(run_id, to_epoch(self.dt) + 86400), (999, 0)])
+            with pytest.raises(sqlite3.IntegrityError):
+                database.add_compacted_days(self.db, [(run_id, 1, 1), (999, 1, 1)])
+        assert self.db.execute(triggers).fetchone()[0] == expected
+        assert count_events(self.db, "run") == 1
+        increment_counter(self.db, run_id, self.dt + timedelta(days=1))
+        assert streak_analyse(self.db, "run")[0] == 2
+        assert self.db.execute("SELECT SUM(count) FROM tracker_period_rollup").fetchone()[0] == 2
+
     def test_streak_analyse(self):
         # assert current_streak(counts, UnitNames.PERIOD_DAILY, required=1) == 5
         habit_name = "water"
@@ -0,0 +1,322 @@
+import ast
+import json
+import os
+import struct
+import sys
+import zipfile
+from array import array
+from collections import namedtuple
+
+import db as database
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional, only the Arrow IPC format needs it
+    pa = None
+
+# name and version of the exchange format, stored in every file
+FORMAT_NAME = "habits"
+FORMAT_VERSION = 1
+# events per chunk: the unit of reading, writing and inserting
+CHUNK_SIZE = 65536
+
+# file suffix -> format
+SUFFIXES = {".jsonl": "jsonl", ".ndjson": "jsonl", ".npz": "npz", ".arrow": "arrow", ".arrows": "arrow"}
+
+# habits, events and compacted days moved by export_database / import_database
+TransferStats = namedtuple("TransferStats", ["habits", "events", "days"])
+
+def format_of(path: str, format: str = None) -> str:
+    """
+    :return: str: the given format, otherwise the one of the file suffix
+    """
+    format = format or SUFFIXES.get(os.path.splitext(path)[1].lower())
+    if format not in WRITERS:
+        raise ValueError(f"Unknown export format of {path!r}, use one of {', '.join(WRITERS)}")
+    return format
+
+# ——— reading the database ———
+
+def _counters(db, tenant):
+    cur = db.execute("""
+    SELECT id, tenant, name, description, period_type, period_count FROM counter
+    WHERE tenant = COALESCE(?, tenant) ORDER BY id
+    """, (tenant,))
+    columns = [column[0] for column in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+def _chunks(db, sql, params, chunk_size):
+    cur = db.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def export_database(db, path: str, format: str = None, chunk_size: int = CHUNK_SIZE,
+                    tenant: str = None) -> TransferStats:
+    """
+    Writes the habits, their events and the compacted day counts to a file:
+    - jsonl: one JSON object per line, a header, then the habits, events and days
+    - npz: a NumPy archive of int64 columns, one member per chunk and column,
+      plus counter.json with the habits (written without NumPy, numpy.load reads it)
+    - arrow: an Arrow IPC stream of (kind, counter_id, value, count) batches,
+      the habits in the schema metadata (needs pyarrow)
+    The events are read and written `chunk_size` rows at a time, so the memory
+    use doesn't grow with the history. The whole export sees one snapshot of
+    the database.
+    :param format: 'jsonl', 'npz' or 'arrow', by default from the file suffix
+    :param tenant: only the habits of this tenant, all of them by default
+    :return: TransferStats: the numbers of habits, events and days written
+    """
+    writer = WRITERS[format_of(path, format)]
+    started = not db.in_transaction
+    if started:
+        db.execute("BEGIN")
+    try:
+        counters = _counters(db, tenant)
+        events = _chunks(db, """
+        SELECT t.counter_id, t.timestamp FROM tracker t JOIN counter c ON c.id = t.counter_id
+        WHERE c.tenant = COALESCE(?, c.tenant) ORDER BY t.id
+        """, (tenant,), chunk_size)
+        days = _chunks(db, """
+        SELECT k.counter_id, k.day_ordinal, k.count FROM tracker_compacted k JOIN counter c ON c.id = k.counter_id
+        WHERE c.tenant = COALESCE(?, c.tenant) ORDER BY k.counter_id, k.day_ordinal
+        """, (tenant,), chunk_size)
+        event_count, day_count = writer(path, counters, events, days)
+    finally:
+        if started:
+            db.rollback()
+    return TransferStats(len(counters), event_count, day_count)
+
+# ——— JSON lines ———
+
+def _write_jsonl(path, counters, events, days):
+    event_count = day_count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"format": FORMAT_NAME, "version": FORMAT_VERSION}) + "\n")
+        for counter in counters:
+            f.write(json.dumps({"type": "counter", **counter}) + "\n")
+        for chunk in events:
+            f.write("".join(f'{{"type":"event","counter_id":{c},"timestamp":{t}}}\n' for c, t in chunk))
+            event_count += len(chunk)
+        for chunk in days:
+            f.write("".join(f'{{"type":"day","counter_id":{c},"day":{d},"count":{n}}}\n' for c, d, n in chunk))
+            day_count += len(chunk)
+    return event_count, day_count
+
+def _read_jsonl(path, chunk_size):
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        _check_header(path, header)
+        counters, events, days = [], [], []
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            kind = row.pop("type")
+            if kind == "counter":
+                if events or days:
+                    raise ValueError(f"{path}: habit {row['name']!r} comes after the events")
+                counters.append(row)
+                continue
+            if counters:
+                yield "counters", counters
+                counters = []
+            if kind == "event":
+                events.append((row["counter_id"], row["timestamp"]))
+                if len(events) >= chunk_size:
+                    yield "events", events
+                    events = []
+            elif kind == "day":
+                days.append((row["counter_id"], row["day"], row["count"]))
+                if len(days) >= chunk_size:
+                    yield "days", days
+                    days = []
+            else:
+                raise ValueError(f"{path}: unknown record type {kind!r}")
+        if counters:
+            yield "counters", counters
+        if events:
+            yield "events", events
+        if days:
+            yield "days", days
+
+# ——— NumPy .npz ———
+
+def _npy(values: array) -> bytes:
+    """
+    The .npy file (format 1.0) of a one-dimensional little-endian int64 array.
+    """
+    if sys.byteorder == "big":
+        values = array("q", values)
+        values.byteswap()
+    header = f"{{'descr': '<i8', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    # the header is padded with spaces so the data starts at a multiple of 64 bytes
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1") + values.tobytes()
+
+def _from_npy(data: bytes) -> array:
+    if data[:6] != b"\x93NUMPY":
+        raise ValueError("not a .npy member")
+    if data[6] == 1:
+        size, start = struct.unpack("<H", data[8:10])[0], 10
+    else:
+        size, start = struct.unpack("<I", data[8:12])[0], 12
+    header = ast.literal_eval(data[start:start + size].decode("latin1"))
+    if header["descr"] != "<i8" or len(header["shape"]) != 1:
+        raise ValueError(f"unsupported array {header}")
+    values = array("q")
+    values.frombytes(data[start + size:])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _write_npz(path, counters, events, days):
+    event_count = day_count = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr("counter.json", json.dumps(
+            {"format": FORMAT_NAME, "version": FORMAT_VERSION, "counters": counters}))
+        for i, chunk in enumerate(events):
+            counter_ids, timestamps = zip(*chunk)
+            zf.writestr(f"tracker_counter_id_{i:06d}.npy", _npy(array("q", counter_ids)))
+            zf.writestr(f"tracker_timestamp_{i:06d}.npy", _npy(array("q", timestamps)))
+            event_count += len(chunk)
+        for i, chunk in enumerate(days):
+            counter_ids, day_ordinals, counts = zip(*chunk)
+            zf.writestr(f"compacted_counter_id_{i:06d}.npy", _npy(array("q", counter_ids)))
+            zf.writestr(f"compacted_day_{i:06d}.npy", _npy(array("q", day_ordinals)))
+            zf.writestr(f"compacted_count_{i:06d}.npy", _npy(array("q", counts)))
+            day_count += len(chunk)
+    return event_count, day_count
+
+def _read_npz(path, chunk_size):
+    with zipfile.ZipFile(path) as zf:
+        header = json.loads(zf.read("counter.json"))
+        _check_header(path, header)
+        yield "counters", header["counters"]
+        names = sorted(zf.namelist())
+        for name in names:
+            if name.startswith("tracker_counter_id_"):
+                chunk = name[len("tracker_counter_id_"):]
+                yield "events", list(zip(
+                    _from_npy(zf.read(name)), _from_npy(zf.read("tracker_timestamp_" + chunk))))
+        for name in names:
+            if name.startswith("compacted_counter_id_"):
+                chunk = name[len("compacted_counter_id_"):]
+                yield "days", list(zip(
+                    _from_npy(zf.read(name)), _from_npy(zf.read("compacted_day_" + chunk)),
+                    _from_npy(zf.read("compacted_count_" + chunk))))
+
+# ——— Arrow IPC ———
+
+# values of the kind column
+_EVENT, _DAY = 0, 1
+
+def _arrow_schema(counters=None):
+    metadata = None
+    if counters is not None:
+        metadata = {b"habits": json.dumps(
+            {"format": FORMAT_NAME, "version": FORMAT_VERSION, "counters": counters}).encode("utf-8")}
+    return pa.schema([
+        ("kind", pa.int8()), ("counter_id", pa.int64()), ("value", pa.int64()), ("count", pa.int64()),
+    ], metadata=metadata)
+
+def _require_arrow():
+    if pa is None:
+        raise ImportError("The Arrow IPC format needs pyarrow, please install it or use jsonl or npz")
+
+def _write_arrow(path, counters, events, days):
+    _require_arrow()
+    schema = _arrow_schema(counters)
+    event_count = day_count = 0
+
+    def batch(kind, counter_ids, values, counts):
+        return pa.record_batch([
+            pa.array([kind] * len(counter_ids), pa.int8()), pa.array(counter_ids, pa.int64()),
+            pa.array(values, pa.int64()), pa.array(counts, pa.int64()),
+        ], schema=schema)
+
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in events:
+            counter_ids, timestamps = zip(*chunk)
+            writer.write_batch(batch(_EVENT, counter_ids, timestamps, [1] * len(chunk)))
+            event_count += len(chunk)
+        for chunk in days:
+            counter_ids, day_ordinals, counts = zip(*chunk)
+            writer.write_batch(batch(_DAY, counter_ids, day_ordinals, counts))
+            day_count += len(chunk)
+    return event_count, day_count
+
+def _read_arrow(path, chunk_size):
+    _require_arrow()
+    with pa.OSFile(path, "rb") as source:
+        reader = pa.ipc.open_stream(source)
+        header = json.loads((reader.schema.metadata or {}).get(b"habits", b"{}"))
+        _check_header(path, header)
+        yield "counters", header["counters"]
+        for batch in reader:
+            kinds, counter_ids, values, counts = (column.to_pylist() for column in batch.columns)
+            events = [(c, v) for k, c, v in zip(kinds, counter_ids, values) if k == _EVENT]
+            days = [(c, v, n) for k, c, v, n in zip(kinds, counter_ids, values, counts) if k == _DAY]
+            if events:
+                yield "events", events
+            if days:
+                yield "days", days
+
+WRITERS = {"jsonl": _write_jsonl, "npz": _write_npz, "arrow": _write_arrow}
+READERS = {"jsonl": _read_jsonl, "npz": _read_npz, "arrow": _read_arrow}
+
+def _check_header(path, header):
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a habit export")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {header['version']}, this version reads up to {FORMAT_VERSION}")
+
+# ——— importing ———
+
+def _import_counter(db, counter, tenant):
+    """
+    :return: int: the ID of the habit in db, created unless the tenant has it already
+    """
+    owner = counter.get("tenant", "") if tenant is None else tenant
+    habit = database.find_habit(db, counter["name"], owner)
+    if habit is None:
+        return database.add_counter(db, counter["name"], counter.get("description"),
+                                    database.UnitNames(counter["period_type"]), counter["period_count"], owner)
+    if (habit.period_type, habit.period_count) != (counter["period_type"], counter["period_count"]):
+        raise ValueError(f"Habit {counter['name']!r} already exists with a different period")
+    return habit.id
+
+def _map_ids(rows, ids, path):
+    try:
+        return [(ids[row[0]], *row[1:]) for row in rows]
+    except KeyError as e:
+        raise ValueError(f"{path}: events of the unknown habit ID {e.args[0]}") from None
+
+def import_database(db, path: str, format: str = None, chunk_size: int = CHUNK_SIZE,
+                    tenant: str = None) -> TransferStats:
+    """
+    Reads a file written by export_database into the database in one
+    transaction: all of it or nothing. Habits that already exist (same tenant
+    and name, same period) receive the events, the others are created with
+    new IDs. The events are inserted chunk by chunk through db.load_events,
+    which updates the rollup once per chunk instead of once per event.
+    :param format: 'jsonl', 'npz' or 'arrow', by default from the file suffix
+    :param tenant: import all habits for this tenant instead of the tenants in the file
+    :return: TransferStats: the numbers of habits, events and days read
+    """
+    reader = READERS[format_of(path, format)]
+    ids = {}  # ID in the file -> ID in db
+    events = days = 0
+    with database.transaction(db):
+        for kind, rows in reader(path, chunk_size):
+            if kind == "counters":
+                for counter in rows:
+                    ids[counter["id"]] = _import_counter(db, counter, tenant)
+            elif kind == "events":
+                events += database.load_events(db, _map_ids(rows, ids, path))
+            else:
+                days += database.add_compacted_days(db, _map_ids(rows, ids, path))
+    return TransferStats(len(ids), events, days)